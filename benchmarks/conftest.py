@@ -0,0 +1,79 @@
+import pytest
+import json
+import os
+import time
+import tracemalloc
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+def pytest_configure(config):
+    config._perf_results = {}
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--perf"):
+        return
+
+    skip = pytest.mark.skip(reason="benchmarks run with --perf")
+    for item in items:
+        if "perf" in getattr(item, "fixturenames", ()):
+            item.add_marker(skip)
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if not config.getoption("--perf-save") or not config._perf_results:
+        return
+
+    baselines = _load_baselines()
+    baselines.update(config._perf_results)
+    with open(BASELINES, "w") as f:
+        json.dump(dict(sorted(baselines.items())), f, indent=2)
+        f.write("\n")
+
+@pytest.fixture
+def perf(request):
+    """
+    :return: function perf(fn, *args, repeat=3, **kwargs) recording the best wall time of repeat calls and the
+    peak memory traced during one more call, and checking them against the baseline of the case with
+    --perf-compare
+    """
+    config = request.config
+
+    def run(fn, *args, repeat=3, **kwargs):
+        fn(*args, **kwargs) # warm up
+
+        wall_time = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(*args, **kwargs)
+            wall_time = min(wall_time, time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            fn(*args, **kwargs)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {"wall_time": wall_time, "peak_memory": peak_memory}
+        config._perf_results[request.node.name] = result
+
+        if config.getoption("--perf-compare"):
+            baseline = _load_baselines().get(request.node.name)
+            if baseline is None:
+                pytest.fail("no baseline for {}, store one with --perf-save".format(request.node.name))
+
+            threshold = config.getoption("--perf-threshold")
+            regressions = ["{} {:.4g} > {:.4g}".format(k, result[k], baseline[k]) for k in result if result[k] > baseline[k] * (1 + threshold)]
+            if regressions:
+                pytest.fail("{} regressed by more than {:.0%}: {}".format(request.node.name, threshold, ", ".join(regressions)))
+
+        return result
+
+    return run
+
+def _load_baselines():
+    if not os.path.exists(BASELINES):
+        return {}
+
+    with open(BASELINES) as f:
+        return json.load(f)
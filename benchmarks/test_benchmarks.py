@@ -0,0 +1,45 @@
+from fractalmarkets.mmar.brownian_motion import BrownianMotion
+from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
+from fractalmarkets.mmar.multiplicative_cascade import MutiplicativeCascade
+from fractalmarkets.mmar.trading_time_cdf import TradingTimeCDF
+from fractalmarkets.msm.markov_switching_multifractal import MarkovSwitchingMultifractal
+from fractalmarkets.rs.rs import RS
+import numpy as np
+import pytest
+
+@pytest.mark.parametrize("k_max", [6, 8, 10, 12])
+def test_brownian_motion(perf, k_max):
+    bm = BrownianMotion(k_max, x=4/9, y=2/3, randomize_segments=True, rng=0)
+    perf(bm.simulate)
+
+@pytest.mark.parametrize("k_max", [6, 8, 10, 12])
+def test_brownian_motion_multifractal_time(perf, k_max):
+    bmmt = BrownianMotionMultifractalTime(k_max, x=0.457, y=0.603, randomize_segments=True, randomize_time=True, M=[0.6, 0.4], rng=0)
+    perf(bmmt.simulate)
+
+@pytest.mark.parametrize("k_max", [10, 15, 20])
+def test_multiplicative_cascade(perf, k_max):
+    cascade = MutiplicativeCascade(k_max, [0.6, 0.4], randomize=True, rng=0)
+    perf(cascade.cascade)
+
+@pytest.mark.parametrize("k_max", [10, 15, 20])
+def test_trading_time_cdf(perf, k_max):
+    cdf = TradingTimeCDF(k_max, [0.6, 0.4], randomize=True, rng=0)
+    t = np.linspace(0, 1, 100000)
+
+    def run():
+        cdf.create_trading_time_cdf()
+        cdf.cdf(t)
+
+    perf(run)
+
+@pytest.mark.parametrize("timesteps", [1000, 100000])
+@pytest.mark.parametrize("k_bar", [4, 10])
+def test_markov_switching_multifractal(perf, timesteps, k_bar):
+    msm = MarkovSwitchingMultifractal(k_bar=k_bar, timesteps=timesteps, rng=0)
+    perf(msm.simulate)
+
+@pytest.mark.parametrize("length", [1000, 10000, 100000])
+def test_rs(perf, length):
+    y = np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, length)))
+    perf(lambda: RS(y, cache_size=0).get_Hc())
@@ -0,0 +1,6 @@
+def pytest_addoption(parser):
+    group = parser.getgroup("perf")
+    group.addoption("--perf", action="store_true", default=False, help="run the benchmarks under benchmarks/, skipped otherwise")
+    group.addoption("--perf-save", action="store_true", default=False, help="store the measured cases in benchmarks/baselines.json")
+    group.addoption("--perf-compare", action="store_true", default=False, help="fail cases slower or larger than their baseline by more than the threshold")
+    group.addoption("--perf-threshold", type=float, default=0.25, help="allowed relative regression of wall time and peak memory, 0.25 by default")
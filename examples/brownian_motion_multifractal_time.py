@@ -1,18 +1,13 @@
 from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
 import matplotlib
 import matplotlib.pyplot as plt; plt.style.use('ggplot')
-from scipy import interpolate
+from fractalmarkets.mmar.resample import resample
 import numpy as np
 
 bmmt = BrownianMotionMultifractalTime(9, x=0.457, y=0.603, randomize_segments=True, randomize_time=True, M=[0.6, 0.4])
 data = bmmt.simulate() # [ [x, y], ..., [x_n, y_n]]
 
-f = interpolate.interp1d(data[:,0], data[:,1])
-
-y = f(np.arange(0, 1, .001))
-x = np.linspace(0, 1, len(y), endpoint=True)
-
-y_diff = [b - a for a, b in zip(y[:-1], y[1:])]
+x, y, y_diff = resample(data, n_points=1000, endpoint=False) # prices and increments on a uniform grid
 
 fig, axs = plt.subplots(2)
 fig.suptitle('Brownian Motion in Multifractal Time')
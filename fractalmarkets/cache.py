@@ -0,0 +1,24 @@
+import numpy as np
+import os
+
+def get_cache_dir(*subdirs):
+    """
+    :param subdirs: subdirectories of the cache directory
+    :return: directory for persisted tables, created if missing. $FRACTALMARKETS_CACHE_DIR or ~/.cache/fractalmarkets
+    """
+    root = os.environ.get("FRACTALMARKETS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "fractalmarkets"))
+    path = os.path.join(root, *subdirs)
+    os.makedirs(path, exist_ok=True)
+
+    return path
+
+def save_array(path, array):
+    """
+    Writes array as a .npy file through a temporary file so concurrent readers never see a partial file.
+    :param path: destination .npy path
+    :param array: array to save
+    """
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp, path)
@@ -0,0 +1,155 @@
+from fractalmarkets.cache import get_cache_dir
+from itertools import islice
+import numpy as np
+import hashlib
+import json
+import os
+
+def load_prices(path, cache_dir=None, validate="mtime", chunk_size=2**20):
+    """
+    Prices of a CSV file of either one price per line or date,price lines, with an optional header line. The file is
+    parsed once into a columnar cache of .npy files, dates as datetime64[s] and prices as float64, which later loads
+    memory map without copying. Parsing streams chunk_size lines at a time into memory mapped outputs, so files larger
+    than memory can be ingested.
+    :param path: path of the CSV file
+    :param cache_dir: directory of the cache. Defaults to get_cache_dir("datasets")
+    :param validate: "mtime" rebuilds the cache when the size or modification time of the file changed, "hash" when its
+    size or sha1 changed
+    :param chunk_size: number of lines parsed at once
+    :return: dates, or None for a single column file, and prices, as read only memory maps
+    """
+    if validate not in ("mtime", "hash"):
+        raise ValueError("{} is not a supported validation. Supported validations are 'mtime' and 'hash'.".format(validate))
+
+    path = os.path.abspath(path)
+    cache_dir = get_cache_dir("datasets") if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = os.path.join(cache_dir, "{}_{}".format(os.path.basename(path), hashlib.sha1(path.encode()).hexdigest()[:16]))
+
+    stat = os.stat(path)
+    source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if validate == "hash":
+        source["sha1"] = _get_sha1(path)
+
+    meta = _read_meta(prefix + ".json")
+    if meta is None or any(meta.get(k) != v for k, v in source.items() if k != "mtime_ns" or validate == "mtime"):
+        meta = _ingest(path, prefix, chunk_size)
+        meta.update(source)
+        meta["sha1"] = source.get("sha1")
+        _write_meta(prefix + ".json", meta)
+
+    prices = np.load(prefix + ".prices.npy", mmap_mode="r")
+    dates = np.load(prefix + ".dates.npy", mmap_mode="r") if meta["dates"] else None
+
+    return dates, prices
+
+def _ingest(path, prefix, chunk_size):
+    """
+    :param path: path of the CSV file
+    :param prefix: path prefix of the cache files
+    :param chunk_size: number of lines parsed at once
+    :return: metadata of the cache, {"rows": number of prices, "dates": whether the file has a date column}
+    """
+    rows, has_dates, header = _scan(path)
+
+    # temporary files are per process so concurrent ingests of the same file never write to the same memory map
+    prices = np.lib.format.open_memmap(_get_tmp_path(prefix, "prices"), mode="w+", dtype=np.float64, shape=(rows,))
+    dates = np.lib.format.open_memmap(_get_tmp_path(prefix, "dates"), mode="w+", dtype="datetime64[s]", shape=(rows,)) if has_dates else None
+
+    start = 0
+    with open(path) as f:
+        if header:
+            next(line for line in f if line.strip())
+
+        while True:
+            raw = list(islice(f, chunk_size))
+            if not raw:
+                break
+            lines = [line for line in raw if line.strip()] # a chunk of blank lines is not the end of the file
+
+            if has_dates:
+                fields = [line.rsplit(",", 1) for line in lines]
+                dates[start:start + len(lines)] = np.array([d.strip() for d, _ in fields], dtype="datetime64[s]")
+                prices[start:start + len(lines)] = np.array([p for _, p in fields], dtype=np.float64)
+            else:
+                prices[start:start + len(lines)] = np.array(lines, dtype=np.float64)
+            start += len(lines)
+
+    prices.flush()
+    if has_dates:
+        dates.flush()
+    del prices, dates
+    assert start == rows, "parsed {} of the {} rows of {}".format(start, rows, path)
+
+    for name in ("prices", "dates") if has_dates else ("prices",):
+        os.replace(_get_tmp_path(prefix, name), "{}.{}.npy".format(prefix, name))
+
+    return {"rows": rows, "dates": has_dates}
+
+def _get_tmp_path(prefix, name):
+    """
+    :param prefix: path prefix of the cache files
+    :param name: column name, "prices" or "dates"
+    :return: path the column is written to by this process before it replaces the cache file
+    """
+    return "{}.{}.npy.{}.tmp".format(prefix, name, os.getpid())
+
+def _scan(path):
+    """
+    :param path: path of the CSV file
+    :return: number of data lines, whether lines are date,price, whether the first line is a header
+    """
+    rows = 0
+    first = None
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                if first is None:
+                    first = line
+                rows += 1
+
+    if first is None:
+        return 0, False, False
+
+    try:
+        float(first.rsplit(",", 1)[-1])
+        header = False
+    except ValueError:
+        header = True
+
+    return rows - header, "," in first, header
+
+def _get_sha1(path, chunk_size=2**24):
+    """
+    :param path: path of a file
+    :param chunk_size: number of bytes hashed at once
+    :return: sha1 hex digest of the file
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+def _read_meta(path):
+    """
+    :param path: path of the metadata file
+    :return: metadata, None if missing or unreadable
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_meta(path, meta):
+    """
+    Written through a temporary file, after the arrays, so a cache with metadata is always complete.
+    :param path: path of the metadata file
+    :param meta: metadata
+    """
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
@@ -0,0 +1,84 @@
+from contextlib import contextmanager, nullcontext
+import time
+
+class Stats:
+    def __init__(self, callback=None):
+        """
+        Opt-in instrumentation of the simulation and estimation pipelines. Pass an instance as the stats argument of
+        BrownianMotion, BrownianMotionMultifractalTime, TradingTimeCDF, MutiplicativeCascade, MarkovSwitchingMultifractal
+        or RS to record the wall time and number of runs of each stage, event counts and the bytes of the arrays built.
+        :param callback: optional function callback(kind, name, value) called on every record, kind being "time",
+        "count" or "bytes". Not pickled, so copies sent to worker processes only accumulate locally
+        """
+        self.callback = callback
+        self.reset()
+
+    def reset(self):
+        self.time = {}
+        self.calls = {}
+        self.counts = {}
+        self.bytes = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        :param name: name of the timed stage. Nested stages are timed independently
+        """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            self.time[name] = self.time.get(name, 0.) + elapsed
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.callback is not None:
+                self.callback("time", name, elapsed)
+
+    def count(self, name, n=1):
+        """
+        :param name: name of the counted event
+        :param n: number of events
+        """
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+        if self.callback is not None:
+            self.callback("count", name, int(n))
+
+    def allocate(self, name, nbytes):
+        """
+        :param name: name of the allocated array
+        :param nbytes: number of bytes allocated
+        """
+        self.bytes[name] = self.bytes.get(name, 0) + int(nbytes)
+        if self.callback is not None:
+            self.callback("bytes", name, int(nbytes))
+
+    def as_dict(self):
+        """
+        :return: {"time": {stage: seconds}, "calls": {stage: runs}, "counts": {event: count}, "bytes": {array: bytes}}
+        """
+        return {"time": dict(self.time), "calls": dict(self.calls), "counts": dict(self.counts), "bytes": dict(self.bytes)}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
+class NullStats:
+    """
+    Default of every stats argument. Records nothing.
+    """
+    _stage = nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, n=1):
+        pass
+
+    def allocate(self, name, nbytes):
+        pass
+
+    def as_dict(self):
+        return {"time": {}, "calls": {}, "counts": {}, "bytes": {}}
+
+NULL_STATS = NullStats()
@@ -1,31 +1,185 @@
 import numpy as np
 from scipy.optimize import fsolve
 import math
+from fractalmarkets.mmar.ensemble import simulate_many, iter_simulate_many
+from fractalmarkets.mmar.counter_rng import CounterRNG, SEGMENTS, get_rng
+from fractalmarkets.instrumentation import NULL_STATS
 
 class BrownianMotion:
 
-    def __init__(self, k_max, x, y, randomize_segments=False):
+    def __init__(self, k_max, x, y, randomize_segments=False, rng=None, stats=None):
         """
         y^(1/H) = x
         :param k_max: max depth of the recursion tree
         :param x: x coord of point P in generator. Brownian motion x=4/9 if y=2/3
         :param y: y coord of point P in generator. Brownian motion x=4/9 if y=2/3
         :param randomize: randomize symmetric generator segments
+        :param rng: numpy.random.Generator, CounterRNG or seed used by simulate. A Generator must not be shared between threads
+        :param stats: fractalmarkets.instrumentation.Stats recording stage times, solver calls and unconverged cells
         """
         self.k_max = k_max
         self.x = x
         self.y = y
         self.randomize_segments = randomize_segments
+        self.rng = get_rng(rng)
+        self.unconverged_cells = 0
+        self.stats = NULL_STATS if stats is None else stats
 
     def get_H(self):
         return 1/math.log(self.x,self.y)
         
-    def simulate(self):
+    def simulate(self, method="vectorized", rng=None):
         """
+        :param method: "vectorized" expands every generator cell of a level at once, "recursive" is the reference implementation
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
         :return: x, y of fbm timeseries
         """
+        return self._simulate(method=method, rng=rng)
+
+    def simulate_many(self, n_paths, seed=None, n_workers=None, chunk_size=None, method="vectorized"):
+        """
+        Monte Carlo ensemble of independent paths, see fractalmarkets.mmar.ensemble.simulate_many
+        :param n_paths: number of paths
+        :param seed: seed of the np.random.SeedSequence spawning one child per path
+        :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+        :param chunk_size: number of paths simulated per task
+        :param method: "vectorized" or "recursive"
+        :return: [[[x, y], ..., [x_n, y_n]], ...] array of shape (n_paths, 3^k_max + 1, 2)
+        """
+        return simulate_many(self, n_paths, seed=seed, n_workers=n_workers, chunk_size=chunk_size, method=method)
+
+    def iter_simulate_many(self, n_paths, seed=None, n_workers=None, chunk_size=None, method="vectorized"):
+        """
+        Streaming counterpart of simulate_many yielding the ensemble in chunks, see fractalmarkets.mmar.ensemble.iter_simulate_many
+        :return: iterator of arrays of shape (chunk_size, 3^k_max + 1, 2)
+        """
+        return iter_simulate_many(self, n_paths, seed=seed, n_workers=n_workers, chunk_size=chunk_size, method=method)
+
+    def iter_simulate(self, block_size=3**10, rng=None):
+        """
+        Bounded memory counterpart of simulate for deep trees. The generator tree is walked depth first with an explicit
+        stack of at most 2 cells per level down to subtrees of at most block_size leaves, and each subtree is expanded
+        level by level as in simulate. Matches simulate when segments are not randomized, otherwise the path has the
+        same law but draws in a different order, unless rng is a CounterRNG.
+        :param block_size: number of points per yielded block
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
+        :return: iterator of (block_size x 2) arrays of x, y in path order, the last block holding the remainder
+        """
+        buffer = np.empty((block_size, 2))
+        buffer[0] = 0
+        fill = 1
+
+        for x, y in self._iter_subtrees(block_size, rng):
+            start = 0
+            while start < len(x):
+                n = min(block_size - fill, len(x) - start)
+                buffer[fill:fill + n, 0] = x[start:start + n]
+                buffer[fill:fill + n, 1] = y[start:start + n]
+                fill += n
+                start += n
+                if fill == block_size:
+                    yield buffer.copy()
+                    fill = 0
+
+        if fill > 0:
+            yield buffer[:fill].copy()
+
+    def simulate_into(self, out, block_size=3**10, rng=None):
+        """
+        Writes the path of iter_simulate into a caller provided buffer without an intermediate copy.
+        :param out: array or np.memmap of shape (3^k_max + 1, 2)
+        :param block_size: max number of points expanded at once
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
+        :return: out
+        """
+        if out.shape != (3**self.k_max + 1, 2):
+            raise ValueError("out has shape {}, expected {}.".format(out.shape, (3**self.k_max + 1, 2)))
+
+        out[0] = 0
+        start = 1
+        for x, y in self._iter_subtrees(block_size, rng):
+            out[start:start + len(x), 0] = x
+            out[start:start + len(x), 1] = y
+            start += len(x)
+
+        return out
+
+    def simulate_to_file(self, path, block_size=3**10, rng=None):
+        """
+        :param path: .npy file the path is written to through a memory map
+        :param block_size: max number of points expanded at once
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
+        :return: np.memmap of shape (3^k_max + 1, 2) backed by path
+        """
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(3**self.k_max + 1, 2))
+        self.simulate_into(out, block_size, rng)
+        out.flush()
+
+        return out
+
+    def _create_cdf(self, method="vectorized", rng=None):
+        """
+        :param method: "vectorized" or "recursive"
+        :param rng: numpy.random.Generator
+        :return: cdf of trading time, None in clock time
+        """
+        return None
+
+    def _iter_subtrees(self, block_size, rng=None):
+        """
+        Depth first walk over the generator tree. Cells at depth k_max - L, with 3^L the largest power of 3 not above
+        block_size, are expanded down to the leaves with _expand_cells_vectorized.
+        :param block_size: max number of leaves of a subtree
+        :param rng: numpy.random.Generator or seed. Defaults to the generator given to the constructor
+        :return: iterator of x, y arrays of the points after the first point of each subtree, in path order
+        """
+        rng = self.rng if rng is None else get_rng(rng)
+        self.unconverged_cells = 0
+        cdf = self._create_cdf(rng=rng)
+
+        levels = 1
+        while levels < self.k_max and 3**(levels + 1) <= block_size:
+            levels += 1
+        levels = min(levels, self.k_max)
+
+        stack = [(0., 0., 1., 1., 0, 0)]
+        while stack:
+            x1, y1, x2, y2, k, index = stack.pop()
+            cell = [np.array([v]) for v in (x1, y1, x2, y2)]
+
+            if k == self.k_max - levels:
+                yield self._expand_cells_vectorized(*cell, levels, self.x, self.y, self.randomize_segments, cdf, rng, k, np.array([index]))
+                continue
+
+            x, y = self._expand_cells_vectorized(*cell, 1, self.x, self.y, self.randomize_segments, cdf, rng, k, np.array([index]))
+            x = np.concatenate([[x1], x])
+            y = np.concatenate([[y1], y])
+            for i in (2, 1, 0):
+                stack.append((x[i], y[i], x[i + 1], y[i + 1], k + 1, 3 * index + i))
+
+    def _simulate(self, cdf=None, method="vectorized", rng=None):
+        """
+        :param cdf: cdf of trading time
+        :param method: "vectorized" or "recursive"
+        :param rng: numpy.random.Generator or seed. Defaults to the generator given to the constructor
+        :return: x, y of timeseries
+        """
+        rng = self.rng if rng is None else get_rng(rng)
+        self.unconverged_cells = 0
+
+        if method == "vectorized":
+            with self.stats.stage("simulate"):
+                data = self._simulate_bm_vectorized(self.k_max, self.x, self.y, self.randomize_segments, cdf, rng)
+            self.stats.allocate("path", data.nbytes)
+            return data
+        elif method == "recursive":
+            if isinstance(rng, CounterRNG):
+                raise ValueError("A CounterRNG requires method 'vectorized'.")
+            with self.stats.stage("simulate"):
+                fbm = np.array(self._simulate_bm_recursively(0, 0, 1, 1, 1, self.k_max, self.x, self.y, self.randomize_segments, cdf, rng))
+        else:
+            raise ValueError("{} is not a supported method. Supported methods are 'vectorized' and 'recursive'.".format(method))
 
-        fbm = np.array(self._simulate_bm_recursively(0, 0, 1, 1, 1, self.k_max, self.x, self.y, self.randomize_segments))
         x = fbm[:,0]
         y = fbm[:,1]
         x = np.delete(x, np.arange(0, x.size, 4))
@@ -36,7 +190,77 @@ class BrownianMotion:
 
         return np.stack([x, y], axis=1)
 
-    def _simulate_bm_recursively(self, x1, y1, x2, y2, k, k_max, x, y, randomize_segments, cdf=None):
+    def _simulate_bm_vectorized(self, k_max, x, y, randomize_segments, cdf=None, rng=None):
+        """
+        Level by level counterpart of _simulate_bm_recursively. All generator cells of a level are held as arrays of
+        (x1, y1, x2, y2) and expanded at once. Children of cell i are cells 3i, 3i+1 and 3i+2 of the next level so the
+        leaves come out in the same order as the depth first recursion.
+
+        :param k_max: max depth of the recursion tree
+        :param x: x coord of point P in generator. Brownian motion x=4/9 if y=2/3
+        :param y: y coord of point P in generator. Brownian motion x=4/9 if y=2/3
+        :param randomize_segments: randomize symmetric generator segments
+        :param cdf: cdf of trading time
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
+        :return: x, y of timeseries, identical to the recursive implementation when nothing is randomized
+        """
+        leaves_x, leaves_y = self._expand_cells_vectorized(np.zeros(1), np.zeros(1), np.ones(1), np.ones(1), k_max, x, y, randomize_segments, cdf, rng)
+
+        data = np.empty((len(leaves_x) + 1, 2))
+        data[0] = 0
+        data[1:, 0] = leaves_x
+        data[1:, 1] = leaves_y
+
+        return data
+
+    def _expand_cells_vectorized(self, x1, y1, x2, y2, levels, x, y, randomize_segments, cdf=None, rng=None, depth=0, index=None):
+        """
+        Expands initiator cells by the given number of levels.
+        :param x1: array of left x coords of the initiators
+        :param y1: array of left y coords of the initiators
+        :param x2: array of right x coords of the initiators
+        :param y2: array of right y coords of the initiators
+        :param levels: number of levels of the generator applied
+        :param x: x coord of point P in generator
+        :param y: y coord of point P in generator
+        :param randomize_segments: randomize symmetric generator segments
+        :param cdf: cdf of trading time
+        :param rng: numpy.random.Generator or CounterRNG
+        :param depth: level of the initiators in the tree, 0 for the root
+        :param index: 1D array of the indices of the initiators within their level, used by a CounterRNG. Defaults to
+        consecutive cells from 0
+        :return: x, y arrays of the points after the left end of each initiator, in path order
+        """
+        counter = isinstance(rng, CounterRNG)
+        if counter and index is None:
+            index = np.arange(len(x1), dtype=np.uint64)
+
+        for k in range(1, levels + 1):
+            with self.stats.stage("construct_generator"):
+                p0, p1, p2, p3 = self._construct_generator_from_initiator(x1, y1, x2, y2, x, y)
+
+            if cdf is not None:
+                with self.stats.stage("deform_clock_time"):
+                    p0, p1, p2, p3 = self._deform_clock_time_vectorized(p0, p1, p2, p3, cdf)
+
+            if randomize_segments:
+                with self.stats.stage("randomize_segments"):
+                    p0, p1, p2, p3 = self._randomize_generator_segments_vectorized(p0, p1, p2, p3, rng, depth + k, index)
+
+            if k == levels:
+                break
+
+            if counter:
+                index = (np.uint64(3) * np.asarray(index, dtype=np.uint64)[:, np.newaxis] + np.arange(3, dtype=np.uint64)).ravel()
+
+            x1 = np.stack([p0[0], p1[0], p2[0]], axis=1).ravel()
+            y1 = np.stack([p0[1], p1[1], p2[1]], axis=1).ravel()
+            x2 = np.stack([p1[0], p2[0], p3[0]], axis=1).ravel()
+            y2 = np.stack([p1[1], p2[1], p3[1]], axis=1).ravel()
+
+        return np.stack([p1[0], p2[0], p3[0]], axis=1).ravel(), np.stack([p1[1], p2[1], p3[1]], axis=1).ravel()
+
+    def _simulate_bm_recursively(self, x1, y1, x2, y2, k, k_max, x, y, randomize_segments, cdf=None, rng=None):
         """
         H = 1/2
              ________
@@ -59,6 +283,7 @@ class BrownianMotion:
         :param x: x coord of point P in generator. Brownian motion x=4/9 if y=2/3
         :param y: y coord of point P in generator. Brownian motion x=4/9 if y=2/3
         :param cdf: cdf of trading time
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
         :return: simulated time series for fractional brownian motion
         """
         p0, p1, p2, p3 = self._construct_generator_from_initiator(x1, y1, x2, y2, x, y)
@@ -67,14 +292,14 @@ class BrownianMotion:
             p0, p1, p2, p3 = self._deform_clock_time(p0, p1, p2, p3, cdf)
 
         if randomize_segments:
-            p0, p1, p2, p3 = self._randomize_generator_segments(p0, p1, p2, p3)
+            p0, p1, p2, p3 = self._randomize_generator_segments(p0, p1, p2, p3, rng)
 
         if (k == k_max):
             return [p0, p1, p2, p3]
 
-        fbm = self._simulate_bm_recursively(p0[0], p0[1], p1[0], p1[1], k+1, k_max, x, y, randomize_segments, cdf)
-        fbm = np.append(fbm, self._simulate_bm_recursively(p1[0], p1[1], p2[0], p2[1], k+1, k_max, x, y, randomize_segments, cdf), axis=0)
-        fbm = np.append(fbm, self._simulate_bm_recursively(p2[0], p2[1], p3[0], p3[1], k+1, k_max, x, y, randomize_segments, cdf), axis=0)
+        fbm = self._simulate_bm_recursively(p0[0], p0[1], p1[0], p1[1], k+1, k_max, x, y, randomize_segments, cdf, rng)
+        fbm = np.append(fbm, self._simulate_bm_recursively(p1[0], p1[1], p2[0], p2[1], k+1, k_max, x, y, randomize_segments, cdf, rng), axis=0)
+        fbm = np.append(fbm, self._simulate_bm_recursively(p2[0], p2[1], p3[0], p3[1], k+1, k_max, x, y, randomize_segments, cdf, rng), axis=0)
 
         return fbm
 
@@ -141,7 +366,9 @@ class BrownianMotion:
         dT2 = math.fabs(dT2)
         dT3 = math.fabs(dT3)
 
-        D = self.solve(dT1, dT2, dT3, x2 - x1)[0]
+        with self.stats.stage("solve"):
+            D = self.solve(dT1, dT2, dT3, x2 - x1)[0]
+        self.stats.count("solve_calls")
 
         dt1 = math.pow(dT1, D)
         dt2 = math.pow(dT2, D)
@@ -154,7 +381,87 @@ class BrownianMotion:
 
         return p0, p1, p2, p3
 
-    def _randomize_generator_segments(self, p0, p1, p2, p3):
+    def _deform_clock_time_vectorized(self, p0, p1, p2, p3, cdf):
+        """
+        Vectorized _deform_clock_time. Every argument holds [x, y] arrays for all cells of a level.
+        :param p0:  point 0 of generators
+        :param p1:  point 1 of generators
+        :param p2:  point 2 of generators
+        :param p3:  point 3 of generators
+        :param cdf: Trading Time CDF evaluated on arrays, clamping clock time to [0, 1]
+        :return: new x,y coordinates of all points after deforming time
+        """
+        x1 = p0[0]
+        x2 = p3[0]
+
+        T0 = cdf(p0[0])
+        T1 = cdf(p1[0])
+        T2 = cdf(p2[0])
+        T3 = cdf(p3[0])
+
+        dT1 = np.abs(T1 - T0)
+        dT2 = np.abs(T2 - T1)
+        dT3 = np.abs(T3 - T2)
+
+        with self.stats.stage("solve"):
+            D, converged = self.solve_vectorized(dT1, dT2, dT3, x2 - x1)
+
+        dt1 = np.power(dT1, D)
+        dt2 = np.power(dT2, D)
+        dt3 = np.power(dT3, D)
+
+        # cells whose segments carry no trading time, such as cells of zero width, have nothing to rescale and stay undeformed
+        total = dt1 + dt2 + dt3
+        degenerate = total == 0
+        m = (x2 - x1) / np.where(degenerate, 1, total)
+
+        unconverged = np.count_nonzero(~converged | degenerate)
+        self.unconverged_cells += unconverged
+        self.stats.count("solve_calls")
+        self.stats.count("solved_cells", len(converged))
+        self.stats.count("unconverged_cells", unconverged)
+
+        p1 = [np.where(degenerate, p1[0], p0[0] + m*dt1), p1[1]]
+        p2 = [np.where(degenerate, p2[0], p1[0] + m*dt2), p2[1]]
+
+        return p0, p1, p2, p3
+
+    def _randomize_generator_segments_vectorized(self, p0, p1, p2, p3, rng=None, level=None, index=None):
+        """
+        Vectorized _randomize_generator_segments. Every argument holds [x, y] arrays for all cells of a level and one
+        permutation of the three segments is drawn per cell in a single batch, or hashed from the cell by a CounterRNG.
+        :param p0: left-most coordinates of the generators
+        :param p1: coordinates of the first break of the generators
+        :param p2: coordinates of the second break of the generators
+        :param p3: coordinates of the right-most point of the generators
+        :param rng: numpy.random.Generator or CounterRNG. Defaults to the generator given to the constructor
+        :param level: level of the generated cells, used by a CounterRNG
+        :param index: 1D array of the indices of the initiators within their level, used by a CounterRNG
+        :return: reordered generators without rotation.
+        """
+        w = np.stack([p1[0] - p0[0], p2[0] - p1[0], p3[0] - p2[0]], axis=1)
+        h = np.stack([p1[1] - p0[1], p2[1] - p1[1], p3[1] - p2[1]], axis=1)
+
+        rng = self.rng if rng is None else rng
+        if isinstance(rng, CounterRNG):
+            order = rng.permutations(SEGMENTS, level, index, 3)
+        else:
+            order = np.argsort(rng.random(w.shape), axis=1)
+        w = np.take_along_axis(w, order, axis=1)
+        h = np.take_along_axis(h, order, axis=1)
+
+        x_1 = p0[0] + w[:,0]
+        y_1 = p0[1] + h[:,0]
+
+        x_2 = x_1 + w[:,1]
+        y_2 = y_1 + h[:,1]
+
+        x_3 = x_2 + w[:,2]
+        y_3 = y_2 + h[:,2]
+
+        return p0, [x_1, y_1], [x_2, y_2], [x_3, y_3]
+
+    def _randomize_generator_segments(self, p0, p1, p2, p3, rng=None):
         """
             ________p3
             |  p1   /|
@@ -181,6 +488,7 @@ class BrownianMotion:
         :param p1: coordinates of the first break of the generator
         :param p2: coordinates of the second break of the generator
         :param p3: coordinates of the right-most point of the generator
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
         :return: reordered generator without rotation.
         """
         w0 = p1[0] - p0[0]
@@ -193,7 +501,8 @@ class BrownianMotion:
         h2 = p3[1] - p2[1]
 
         segments = [[w0, h0], [w1, h1], [w2, h2]]
-        np.random.shuffle(segments)
+        rng = self.rng if rng is None else rng
+        rng.shuffle(segments)
 
         x_0 = p0[0]
         y_0 = p0[1]
@@ -229,4 +538,61 @@ class BrownianMotion:
         
         solution = fsolve(f,w,xtol=1e-10)
         
-        return solution
\ No newline at end of file
+        return solution
+
+    def solve_vectorized(self, x, y, z, w, xtol=1e-10, maxiter=100):
+        """
+        Batched counterpart of solve. Finds a such that x^a + y^a + z^a = w for whole arrays of cells with a safeguarded
+        Newton iteration. For 0 < x, y, z < 1 the left hand side is strictly decreasing in a, so the root is kept inside a
+        bracket [lo, hi] and any Newton step leaving the bracket is replaced by bisection.
+        :param x: array of dT1
+        :param y: array of dT2
+        :param z: array of dT3
+        :param w: array of clock time widths
+        :param xtol: relative tolerance between two consecutive iterates
+        :param maxiter: max number of iterations
+        :return: array of solutions, boolean array flagging the cells that converged
+        """
+        d = np.stack(np.broadcast_arrays(x, y, z)).astype(np.float64)
+        w = np.broadcast_to(w, d.shape[1:]).astype(np.float64)
+
+        positive = d > 0
+        log_d = np.log(np.where(positive, d, 1))
+
+        def f(a):
+            p = np.where(positive, np.exp(a * log_d), 0)
+            return np.sum(p, axis=0) - w, np.sum(p * log_d, axis=0)
+
+        # lo = 0 brackets the root whenever the segments carry more than w at a = 0. Grow hi until it brackets the other side.
+        lo = np.zeros_like(w)
+        hi = np.ones_like(w)
+        bracketed = f(lo)[0] > 0
+        for _ in range(64):
+            grow = bracketed & (f(hi)[0] > 0)
+            if not np.any(grow):
+                break
+            lo = np.where(grow, hi, lo)
+            hi = np.where(grow, 2 * hi, hi)
+        bracketed &= f(hi)[0] <= 0
+
+        a = np.clip(w, lo, hi)
+        converged = ~bracketed
+        for _ in range(maxiter):
+            if np.all(converged):
+                break
+
+            fa, dfa = f(a)
+            lo = np.where(fa > 0, a, lo)
+            hi = np.where(fa > 0, hi, a)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                a_next = a - fa / dfa
+            bisect = ~np.isfinite(a_next) | (a_next < lo) | (a_next > hi)
+            a_next = np.where(bisect, (lo + hi) / 2, a_next)
+
+            done = converged | (fa == 0) | (hi - lo <= xtol * np.abs(a)) | (~bisect & (np.abs(a_next - a) <= xtol * np.abs(a)))
+            a = np.where(converged, a, a_next)
+            converged = done
+
+        return a, converged & bracketed
+
@@ -1,9 +1,10 @@
 from fractalmarkets.mmar.brownian_motion import BrownianMotion
-import numpy as np
 from fractalmarkets.mmar.trading_time_cdf import TradingTimeCDF
+from fractalmarkets.mmar.counter_rng import get_rng
+from fractalmarkets.mmar.cache import get_default_cache
 
 class BrownianMotionMultifractalTime(BrownianMotion):
-    def __init__(self, k_max, x, y, randomize_time=False, randomize_segments=False, M=[0.6, 0.4]):
+    def __init__(self, k_max, x, y, randomize_time=False, randomize_segments=False, M=[0.6, 0.4], rng=None, stats=None, cache=None):
         """
          y^(1/H) = x
         :param k_max: max depth of the recursion tree
@@ -11,27 +12,35 @@ class BrownianMotionMultifractalTime(BrownianMotion):
         :param y: y coord of point P in generator. Brownian motion x=4/9 if y=2/3
         :param randomize: shuffle symmetric generator and shuffle M before assigning mass to child cells. See page 13 of "A Multifractal Model of Asset Returns" 1997
         :param M: array m0, m1, ..., mb where sum(M) = 1
+        :param rng: numpy.random.Generator or seed used by simulate. A Generator must not be shared between threads
+        :param stats: fractalmarkets.instrumentation.Stats, shared with the trading time cdf
+        :param cache: fractalmarkets.mmar.cache.TableCache of deterministic trading time CDF tables. Defaults to the cache
+        shared within the process
         """
-        super().__init__(k_max, x, y, randomize_segments)
+        super().__init__(k_max, x, y, randomize_segments, rng, stats)
         self.M = M
         self.trading_time = None
         self.randomize_time = randomize_time
+        self.cache = get_default_cache() if cache is None else cache
 
-    def simulate(self):
+    def simulate(self, method="vectorized", rng=None):
         """
+        :param method: "vectorized" expands every generator cell of a level at once, "recursive" is the reference implementation
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
         :return: x, y of bownian motion in multifractal time timeseries
         """
+        rng = self.rng if rng is None else get_rng(rng)
 
-        self.trading_time = TradingTimeCDF(self.k_max, self.M, self.randomize_time)
-        self.trading_time.create_trading_time_cdf()
+        return self._simulate(cdf=self._create_cdf(method, rng), method=method, rng=rng)
 
-        fbm = np.array(super()._simulate_bm_recursively(0, 0, 1, 1, 1, self.k_max, self.x, self.y, self.randomize_segments, cdf=self.trading_time.cdf))
-
-        x = fbm[:,0]
-        y = fbm[:,1]
-        x = np.delete(x, np.arange(0, x.size, 4))
-        y = np.delete(y, np.arange(0, y.size, 4))
-        x = np.insert(x, 0, 0)
-        y = np.insert(y, 0, 0)
+    def _create_cdf(self, method="vectorized", rng=None):
+        """
+        :param method: method used to build the multiplicative cascade, "vectorized" or "recursive"
+        :param rng: numpy.random.Generator
+        :return: cdf of a new trading time
+        """
+        with self.stats.stage("trading_time_cdf"):
+            self.trading_time = TradingTimeCDF(self.k_max, self.M, self.randomize_time, rng, self.stats)
+            self.trading_time.create_trading_time_cdf(method=method, cache=self.cache)
 
-        return np.stack([x, y], axis=1)
\ No newline at end of file
+        return self.trading_time.cdf
\ No newline at end of file
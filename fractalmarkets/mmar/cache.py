@@ -0,0 +1,88 @@
+from fractalmarkets.cache import save_array
+from collections import OrderedDict
+import numpy as np
+import hashlib
+import threading
+import os
+
+class TableCache:
+    def __init__(self, max_bytes=2**28, cache_dir=None):
+        """
+        Least recently used cache of trading time CDF tables keyed by (k_max, tuple(M), seed), bounded by the bytes of
+        the tables held. Only deterministic tables are cached: seed is None for a cascade that is not randomized, or the
+        seed of a CounterRNG.
+
+        With a cache_dir, tables are also saved as .npy files and loaded memory mapped, so processes sharing the
+        directory build each table once. Pickled copies, as sent to worker processes, keep the settings but not the
+        tables, and copies of the default cache resolve to the default cache of the receiving process.
+        :param max_bytes: max total bytes of the tables held in memory, 0 disables the memory tier
+        :param cache_dir: directory of the .npy tier, for instance fractalmarkets.cache.get_cache_dir("mmar"). None
+        keeps tables in memory only
+        """
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.nbytes = 0
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        :param key: (k_max, tuple(M), seed)
+        :param build: function returning the table of key, called on a miss of both tiers
+        :return: read only table
+        """
+        with self._lock:
+            if key in self._tables:
+                self._tables.move_to_end(key)
+                return self._tables[key]
+
+        path = None
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = os.path.join(self.cache_dir, self._get_filename(key))
+
+        if path is not None and os.path.exists(path):
+            table = np.load(path, mmap_mode="r")
+        else:
+            table = build()
+            table.flags.writeable = False
+            if path is not None:
+                save_array(path, table)
+
+        with self._lock:
+            if key not in self._tables:
+                self._tables[key] = table
+                self.nbytes += table.nbytes
+            while self._tables and self.nbytes > self.max_bytes:
+                self.nbytes -= self._tables.popitem(last=False)[1].nbytes
+
+        return table
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+            self.nbytes = 0
+
+    def _get_filename(self, key):
+        """
+        :param key: (k_max, tuple(M), seed)
+        :return: .npy file name of key
+        """
+        k_max, M, seed = key
+        digest = hashlib.sha1(np.asarray(M, dtype=np.float64).tobytes()).hexdigest()[:16]
+
+        return "cdf_{}_{}_{}.npy".format(k_max, digest, seed)
+
+    def __reduce__(self):
+        if self is _default_cache:
+            return get_default_cache, ()
+
+        return TableCache, (self.max_bytes, self.cache_dir)
+
+_default_cache = TableCache()
+
+def get_default_cache():
+    """
+    :return: cache shared by every BrownianMotionMultifractalTime of this process without a cache of its own
+    """
+    return _default_cache
@@ -0,0 +1,131 @@
+from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
+from fractalmarkets.rs.multi import MultiRS
+from fractalmarkets.rs.rs import RS
+from fractalmarkets.rs.partition import get_time_scales, get_partition_function, get_tau
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import brentq
+import numpy as np
+import math
+import os
+
+def get_generator(H):
+    """
+    Point P = (x, y) of the symmetric generator (0, 0), (x, y), (1 - x, 1 - y), (1, 1) of a unifractal Brownian motion
+    with exponent H, that is 2 y^(1/H) + |1 - 2y|^(1/H) = 1 and x = y^(1/H). H = 0.5 gives x = 4/9, y = 2/3.
+    :param H: Hurst exponent in (0, 1)
+    :return: x, y
+    """
+    y = brentq(lambda y: 2 * math.pow(y, 1 / H) + math.pow(2 * y - 1, 1 / H) - 1, 0.5, 1)
+
+    return math.pow(y, 1 / H), y
+
+def calibrate(y, H=np.linspace(0.3, 0.8, 11), m_0=np.linspace(0.5, 0.8, 7), k_max=None, q=np.linspace(0.5, 4, 8), n_paths=8, eta=2, rounds=4, seed=0, n_workers=None):
+    """
+    Grid search of (H, m_0) of BrownianMotionMultifractalTime with M = [m_0, 1 - m_0] against an observed price series.
+    A candidate scores the squared distance between the mean statistics of its simulated paths and those of y: the R/S
+    Hurst exponent of RS.get_Hc and the scaling function tau(q) of the partition function.
+
+    Candidates are pruned by successive halving. Every round simulates n_paths * eta^round new paths per surviving
+    candidate on a process pool, scores candidates on all of their paths so far and keeps the best 1 / eta of them.
+    Simulated paths are sampled at len(y) evenly spaced clock times and taken as log prices.
+    :param y: 1D array of prices
+    :param H: 1D array of candidate Hurst exponents
+    :param m_0: 1D array of candidate multipliers of the binomial trading time cascade
+    :param k_max: max depth of the recursion tree. Defaults to the smallest depth with at least len(y) points
+    :param q: 1D array of moments of the scaling function
+    :param n_paths: number of paths per candidate in the first round
+    :param eta: growth of the number of paths, and inverse of the fraction of candidates kept, from one round to the next
+    :param rounds: maximum number of rounds
+    :param seed: seed of the np.random.SeedSequence spawning the paths of every candidate
+    :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+    :return: dict of the best H, m_0, x, y, M and k_max, its score, H_rs and tau, the observed H_rs and tau, and a
+    (n_candidates x 4) array of H, m_0, score and number of paths of every candidate
+    """
+    k_max = math.ceil(math.log(len(y) - 1, 3)) if k_max is None else k_max
+    q = np.asarray(q, dtype=np.float64)
+    dt = get_time_scales(len(y) - 1)
+
+    observed = np.concatenate([[RS(y).get_Hc()[0]], get_tau(*get_partition_function(y, q, dt))[0]])
+
+    candidates = [(h, m) for h in H for m in m_0]
+    seeds = np.random.SeedSequence(seed).spawn(len(candidates))
+    stats = [np.empty((0, len(observed))) for _ in candidates]
+    scores = np.full(len(candidates), np.inf)
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    executor = ProcessPoolExecutor(max_workers=n_workers) if n_workers != 1 else None
+    try:
+        alive = list(range(len(candidates)))
+        for r in range(rounds):
+            tasks = [(candidates[i][0], candidates[i][1], k_max, len(y), n_paths * eta**r, seeds[i].spawn(1)[0], q, dt) for i in alive]
+            if executor is None:
+                results = [_simulate_candidate(*task) for task in tasks]
+            else:
+                results = list(executor.map(_simulate_candidate, *zip(*tasks)))
+
+            for i, result in zip(alive, results):
+                stats[i] = np.concatenate([stats[i], result])
+                scores[i] = _get_score(stats[i], observed)
+
+            if len(alive) == 1:
+                break
+            alive = sorted(alive, key=lambda i: scores[i])[:max(1, len(alive) // eta)]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    best = int(np.argmin(scores))
+    h, m = candidates[best]
+    x_p, y_p = get_generator(h)
+    mean = np.mean(stats[best], axis=0)
+
+    return {
+        "H": h,
+        "m_0": m,
+        "x": x_p,
+        "y": y_p,
+        "M": [m, 1 - m],
+        "k_max": k_max,
+        "score": scores[best],
+        "H_rs": mean[0],
+        "tau": mean[1:],
+        "observed_H_rs": observed[0],
+        "observed_tau": observed[1:],
+        "candidates": np.array([(h, m, s, len(st)) for (h, m), s, st in zip(candidates, scores, stats)])
+    }
+
+def _get_score(stats, observed):
+    """
+    :param stats: (n_paths x 1 + len(q)) array of H_rs and tau(q) of simulated paths
+    :param observed: H_rs and tau(q) of the observed series
+    :return: squared distance of H_rs plus mean squared distance of tau(q), between path means and observed
+    """
+    mean = np.mean(stats, axis=0)
+
+    return (mean[0] - observed[0])**2 + np.mean((mean[1:] - observed[1:])**2)
+
+def _simulate_candidate(H, m_0, k_max, n_obs, n_paths, seed, q, dt):
+    """
+    :param H: Hurst exponent of the generator
+    :param m_0: multiplier of the trading time cascade
+    :param k_max: max depth of the recursion tree
+    :param n_obs: number of prices sampled per path
+    :param n_paths: number of paths
+    :param seed: np.random.SeedSequence of the paths
+    :param q: 1D array of moments
+    :param dt: 1D array of time scales
+    :return: (n_paths x 1 + len(q)) array of H_rs and tau(q) of every path
+    """
+    x, y = get_generator(H)
+    bmmt = BrownianMotionMultifractalTime(k_max, x=x, y=y, randomize_segments=True, randomize_time=True, M=[m_0, 1 - m_0], rng=np.random.default_rng(seed))
+
+    t = np.linspace(0, 1, n_obs)
+    prices = np.empty((n_paths, n_obs))
+    for i in range(n_paths):
+        data = bmmt.simulate()
+        prices[i] = np.exp(np.interp(t, data[:, 0], data[:, 1]))
+
+    H_rs = np.array([h for h, _ in MultiRS(prices).get_Hc().values()])
+    tau = np.stack([get_tau(*get_partition_function(p, q, dt))[0] for p in prices])
+
+    return np.column_stack([H_rs, tau])
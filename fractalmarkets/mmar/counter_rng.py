@@ -0,0 +1,49 @@
+import numpy as np
+
+SEGMENTS = 0
+CASCADE = 1
+
+class CounterRNG:
+    def __init__(self, seed=0):
+        """
+        Counter based randomness for the vectorized engines. Instead of drawing from a stream, the permutation of a cell
+        is a hash of (seed, stream, level, cell index), so any cell of the tree can be drawn on its own and a full
+        simulation agrees with fractalmarkets.mmar.lazy_path.LazyPath. Pass an instance as the rng of simulate.
+        :param seed: int seed
+        """
+        self.seed = int(seed) % 2**64
+
+    def permutations(self, stream, level, index, n):
+        """
+        :param stream: SEGMENTS for generator segments, CASCADE for multipliers of the trading time cascade
+        :param level: level of the children being drawn, 1 for the children of the initiator
+        :param index: 1D array of cell indices within their level, below 2^64
+        :param n: number of children per cell
+        :return: (len(index) x n) array holding a permutation of range(n) per cell
+        """
+        index = np.asarray(index).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            h = _splitmix64(np.full(index.shape, self.seed, dtype=np.uint64) ^ np.uint64(stream))
+            h = _splitmix64(h ^ np.uint64(level))
+            h = _splitmix64(h ^ index)
+            keys = _splitmix64(h[:, np.newaxis] + np.arange(n, dtype=np.uint64))
+
+        return np.argsort(keys, axis=1)
+
+def get_rng(rng):
+    """
+    :param rng: CounterRNG, numpy.random.Generator, seed or None
+    :return: rng if it is a CounterRNG, np.random.default_rng(rng) otherwise
+    """
+    return rng if isinstance(rng, CounterRNG) else np.random.default_rng(rng)
+
+def _splitmix64(x):
+    """
+    :param x: uint64 array
+    :return: splitmix64 finalizer of x, wrapping on overflow
+    """
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+
+    return x ^ (x >> np.uint64(31))
@@ -0,0 +1,68 @@
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+def simulate_many(process, n_paths, seed=None, n_workers=None, chunk_size=None, method="vectorized"):
+    """
+    Monte Carlo ensemble of independent paths of a simulation process. Path i is simulated with a generator seeded by
+    child i of np.random.SeedSequence(seed), so the ensemble is identical for any n_workers and chunk_size.
+    :param process: BrownianMotion or BrownianMotionMultifractalTime
+    :param n_paths: number of paths
+    :param seed: seed of the np.random.SeedSequence spawning one child per path
+    :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+    :param chunk_size: number of paths simulated per task
+    :param method: "vectorized" or "recursive"
+    :return: [[[x, y], ..., [x_n, y_n]], ...] array of shape (n_paths, 3^k_max + 1, 2)
+    """
+    paths = np.empty((n_paths, 3**process.k_max + 1, 2))
+
+    start = 0
+    for chunk in iter_simulate_many(process, n_paths, seed=seed, n_workers=n_workers, chunk_size=chunk_size, method=method):
+        paths[start:start + len(chunk)] = chunk
+        start += len(chunk)
+
+    return paths
+
+def iter_simulate_many(process, n_paths, seed=None, n_workers=None, chunk_size=None, method="vectorized"):
+    """
+    Streaming counterpart of simulate_many. Chunks are yielded in path order and at most two chunks per worker are in
+    flight at any time, so memory stays bounded however many paths are requested.
+    :param process: BrownianMotion or BrownianMotionMultifractalTime
+    :param n_paths: number of paths
+    :param seed: seed of the np.random.SeedSequence spawning one child per path
+    :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+    :param chunk_size: number of paths simulated per task
+    :param method: "vectorized" or "recursive"
+    :return: iterator of arrays of shape (chunk_size, 3^k_max + 1, 2)
+    """
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    if chunk_size is None:
+        chunk_size = max(1, -(-n_paths // (4 * n_workers)))
+
+    seeds = np.random.SeedSequence(seed).spawn(n_paths)
+    chunks = [seeds[i:i + chunk_size] for i in range(0, n_paths, chunk_size)]
+
+    if n_workers == 1:
+        for chunk in chunks:
+            yield _simulate_chunk(process, chunk, method)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_simulate_chunk, process, chunk, method))
+            if len(pending) >= 2 * n_workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+def _simulate_chunk(process, seeds, method="vectorized"):
+    """
+    :param process: BrownianMotion or BrownianMotionMultifractalTime
+    :param seeds: list of np.random.SeedSequence, one per path
+    :param method: "vectorized" or "recursive"
+    :return: stacked paths of the chunk
+    """
+    return np.stack([process.simulate(method=method, rng=np.random.default_rng(s)) for s in seeds])
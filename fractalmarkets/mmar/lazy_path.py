@@ -0,0 +1,131 @@
+from fractalmarkets.mmar.counter_rng import CounterRNG, CASCADE
+import numpy as np
+
+class LazyPath:
+    def __init__(self, process, seed=0):
+        """
+        Random access to the path of process.simulate(rng=CounterRNG(seed)) without building it. Every cell of the
+        generator tree, and of the trading time cascade, draws its permutation from a hash of its level and index, so a
+        query only descends the cells holding the queried times. A value costs O(k_max) generator cells, each
+        deformed by trading time values that cost O(k_max) cascade cells in multifractal time.
+        :param process: BrownianMotion or BrownianMotionMultifractalTime, giving k_max, the generator, the randomization
+        and M. k_max is at most 39 so cell indices fit 64 bits
+        :param seed: seed of the CounterRNG
+        """
+        if process.k_max > 39:
+            raise ValueError("k_max of {} is not supported. Cell indices of a LazyPath hold k_max up to 39.".format(process.k_max))
+
+        self.process = process
+        self.rng = CounterRNG(seed)
+        self.cdf = None
+
+        if hasattr(process, "M"):
+            self.M = np.asarray(process.M, dtype=np.float64)
+            if len(self.M) ** process.k_max >= 2**63:
+                raise ValueError("A cascade of {} cells per level and depth {} does not fit 64 bit cell indices.".format(len(self.M), process.k_max))
+            self.cdf = self.evaluate_cdf
+
+    def value_at(self, t):
+        """
+        :param t: clock time, scalar or array. Values outside of [0, 1] are clamped
+        :return: value of the piecewise linear path at t, as np.interp over the points of the full simulation
+        """
+        t = np.asarray(t, dtype=np.float64)
+        u = np.clip(t.ravel(), 0, 1)
+        rows = np.arange(len(u))
+
+        x1, y1, x2, y2, index = np.zeros(len(u)), np.zeros(len(u)), np.ones(len(u)), np.ones(len(u)), np.zeros(len(u), dtype=np.uint64)
+        for k in range(1, self.process.k_max + 1):
+            xs, ys = self._expand(x1, y1, x2, y2, k, index)
+            c = (u >= xs[1]).astype(np.intp) + (u >= xs[2])
+
+            x1, y1, x2, y2 = xs[c, rows], ys[c, rows], xs[c + 1, rows], ys[c + 1, rows]
+            index = np.uint64(3) * index + c.astype(np.uint64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = np.where(x2 > x1, (y2 - y1) / (x2 - x1) * (u - x1) + y1, y1)
+
+        return value.reshape(t.shape)[()]
+
+    def segment(self, t0, t1, k_max=None):
+        """
+        Zoom into [t0, t1]. Only cells overlapping the interval are expanded, so the cost grows with the number of
+        points returned rather than with the whole path.
+        :param t0: start of the interval in clock time
+        :param t1: end of the interval in clock time
+        :param k_max: depth of the returned points, at most process.k_max. Points of a shallower level are points of the
+        full path
+        :return: [[x, y], ...] points of the path at depth k_max with t0 <= x <= t1, in path order
+        """
+        k_max = self.process.k_max if k_max is None else min(k_max, self.process.k_max)
+
+        x1, y1, x2, y2, index = np.zeros(1), np.zeros(1), np.ones(1), np.ones(1), np.zeros(1, dtype=np.uint64)
+        for k in range(1, k_max + 1):
+            xs, ys = self._expand(x1, y1, x2, y2, k, index)
+
+            x1, y1, x2, y2 = xs[:-1].T.ravel(), ys[:-1].T.ravel(), xs[1:].T.ravel(), ys[1:].T.ravel()
+            index = (np.uint64(3) * index[:, np.newaxis] + np.arange(3, dtype=np.uint64)).ravel()
+
+            keep = (x2 >= t0) & (x1 <= t1)
+            x1, y1, x2, y2, index = x1[keep], y1[keep], x2[keep], y2[keep], index[keep]
+
+        x = np.concatenate([x1[:1], x2])
+        y = np.concatenate([y1[:1], y2])
+        inside = (x >= t0) & (x <= t1)
+
+        return np.stack([x[inside], y[inside]], axis=1)
+
+    def evaluate_cdf(self, t):
+        """
+        Trading time CDF of the cascade of CounterRNG(seed), evaluated by descending the cells holding t. Agrees with
+        TradingTimeCDF.evaluate up to rounding.
+        :param t: clock time, array. Values outside of [0, 1] are clamped
+        :return: trading time at t
+        """
+        t = np.asarray(t, dtype=np.float64)
+        b = len(self.M)
+        k_max = self.process.k_max
+        n = b**k_max
+
+        u = np.clip(t.ravel(), 0, 1) * n
+        i = np.minimum(u.astype(np.int64), n - 1)
+        rows = np.arange(len(u))
+
+        theta = np.zeros(len(u))
+        mass = np.ones(len(u))
+        index = np.zeros(len(u), dtype=np.int64)
+        for k in range(1, k_max + 1):
+            c = (i // b**(k_max - k)) % b
+            if self.process.randomize_time:
+                m = self.M[self.rng.permutations(CASCADE, k, index, b)]
+            else:
+                m = np.broadcast_to(self.M, (len(u), b))
+
+            left = np.cumsum(m, axis=1) - m
+            theta += mass * left[rows, c]
+            mass *= m[rows, c]
+            index = index * b + c
+
+        return (theta + mass * (u - i)).reshape(t.shape)
+
+    def _expand(self, x1, y1, x2, y2, level, index):
+        """
+        :param x1: array of left x coords of the cells
+        :param y1: array of left y coords of the cells
+        :param x2: array of right x coords of the cells
+        :param y2: array of right y coords of the cells
+        :param level: level of the generated cells
+        :param index: array of cell indices within level - 1
+        :return: (4 x n) arrays of the x and y coords of the generator points of each cell, as simulated by the
+        vectorized engine
+        """
+        process = self.process
+        p0, p1, p2, p3 = process._construct_generator_from_initiator(x1, y1, x2, y2, process.x, process.y)
+
+        if self.cdf is not None:
+            p0, p1, p2, p3 = process._deform_clock_time_vectorized(p0, p1, p2, p3, self.cdf)
+
+        if process.randomize_segments:
+            p0, p1, p2, p3 = process._randomize_generator_segments_vectorized(p0, p1, p2, p3, self.rng, level, index)
+
+        return np.stack([p0[0], p1[0], p2[0], p3[0]]), np.stack([p0[1], p1[1], p2[1], p3[1]])
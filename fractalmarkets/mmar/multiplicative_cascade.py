@@ -1,22 +1,87 @@
 import numpy as np
+from fractalmarkets.mmar.counter_rng import CounterRNG, CASCADE, get_rng
+from fractalmarkets.instrumentation import NULL_STATS
 
 class MutiplicativeCascade:
-    def __init__(self, k_max, M, randomize=False):
+    def __init__(self, k_max, M, randomize=False, dtype=np.float64, rng=None, stats=None):
+        """
+        :param k_max: max depth of the recursion tree
+        :param M: array m0, m1, ..., mb where sum(M) = 1
+        :param randomize: whether or not to shuffle M before assigning mass to child cells. See page 13 of "A Multifractal Model of Asset Returns" 1997
+        :param dtype: floating point type of the cascade. np.float32 halves the memory of very deep cascades
+        :param rng: numpy.random.Generator, CounterRNG or seed used when randomized
+        :param stats: fractalmarkets.instrumentation.Stats recording the cascade time and size
+        """
         self.k_max = k_max
         self.M = M
         self.randomize = randomize
+        self.dtype = np.dtype(dtype).type
+        self.rng = get_rng(rng)
+        self.stats = NULL_STATS if stats is None else stats
         self.data = []
     
-    def cascade(self):
-        y = self._cascade_recursively(1, 1, 1, self.k_max, self.M, self.randomize)
-        x = np.linspace(0, 1, num=len(y), endpoint=False)
+    def cascade(self, method="vectorized", rng=None):
+        """
+        :param method: "vectorized" builds one level of the cascade at a time, "recursive" is the reference implementation
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
+        """
+        rng = self.rng if rng is None else get_rng(rng)
+
+        with self.stats.stage("cascade"):
+            if method == "vectorized":
+                y = self._cascade_vectorized(self.k_max, self.M, self.randomize, rng)
+            elif method == "recursive":
+                if isinstance(rng, CounterRNG):
+                    raise ValueError("A CounterRNG requires method 'vectorized'.")
+                y = self._cascade_recursively(1, 1, 1, self.k_max, self.M, self.randomize, rng).astype(self.dtype)
+            else:
+                raise ValueError("{} is not a supported method. Supported methods are 'vectorized' and 'recursive'.".format(method))
+
+        x = np.linspace(0, 1, num=len(y), endpoint=False, dtype=self.dtype)
 
         y = np.insert(y, 0, 0)
-        x = np.append(x, 1)
+        x = np.append(x, self.dtype(1))
 
         self.data = np.stack([x, y], axis=1)
+        self.stats.allocate("cascade", self.data.nbytes)
+
+    def _cascade_vectorized(self, k_max, M, randomize=False, rng=None):
+        """
+        Builds the cascade as a Kronecker product of M across levels, one level at a time. Cell i of a level splits into
+        cells b*i, ..., b*i + b - 1 of the next level, so the cells come out in the same order as the depth first
+        recursion. When randomized, every cell of a level gets its own permutation of M from a single batched draw, or
+        hashed from the cell by a CounterRNG.
+
+        :param k_max: max depth of the recursion tree
+        :param M: array m0, m1, ..., mb where sum(M) = 1
+        :param randomize: whether or not to shuffle M before assigning mass to child cells. See page 13 of "A Multifractal Model of Asset Returns" 1997
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
+        :return: [y, ...] corresponding to multiplicative cascade y coordinates
+        """
+        rng = self.rng if rng is None else rng
+        M = np.asarray(M, dtype=self.dtype)
+        b = len(M)
+
+        x = self.dtype(1)
+        y = np.ones(1, dtype=self.dtype)
+        for k in range(1, k_max + 1):
+            a = x * y
+            x_next = x / b
+
+            if randomize and isinstance(rng, CounterRNG):
+                m = M[rng.permutations(CASCADE, k, np.arange(len(y)), b)]
+            elif randomize:
+                order = np.argsort(rng.random((len(y), b)), axis=1)
+                m = M[order]
+            else:
+                m = M[np.newaxis,:]
+
+            y = ((m * a[:,np.newaxis]) / x_next).ravel()
+            x = x_next
+
+        return y
 
-    def _cascade_recursively(self, x, y, k, k_max, M, randomize=False):
+    def _cascade_recursively(self, x, y, k, k_max, M, randomize=False, rng=None):
         """
         :param x: width of current cell
         :param y: height of current cell
@@ -24,14 +89,16 @@ class MutiplicativeCascade:
         :param k_max: max depth of the recursion tree
         :param M: array m0, m1, ..., mb where sum(M) = 1
         :param randomize: whether or not to shuffle M before assigning mass to child cells. See page 13 of "A Multifractal Model of Asset Returns" 1997
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
         :return: [y, ...] corresponding to multiplicative cascade y coordinates
         """
+        rng = self.rng if rng is None else rng
         a = x * y
         x_next = x / len(M)
 
         M_shuffle = np.copy(M)
         if randomize:
-            np.random.shuffle(M_shuffle)
+            rng.shuffle(M_shuffle)
         else:
             M_shuffle = M_shuffle
             
@@ -43,6 +110,6 @@ class MutiplicativeCascade:
             return y_i
 
         for m in M_shuffle:
-            y_i = np.append(y_i, self._cascade_recursively(x_next, (m * a) / x_next, k + 1, k_max, M, randomize))
+            y_i = np.append(y_i, self._cascade_recursively(x_next, (m * a) / x_next, k + 1, k_max, M, randomize, rng))
         
         return y_i
\ No newline at end of file
@@ -0,0 +1,48 @@
+import numpy as np
+
+def resample(data, n_points=1001, endpoint=True, increments="arithmetic"):
+    """
+    Samples simulated paths at evenly spaced clock times by linear interpolation, as np.interp would for each path.
+    Paths are shifted apart along the time axis and concatenated, so one searchsorted call locates every grid point of
+    every path.
+    :param data: [[x, y], ...] path of shape (n, 2) as returned by simulate, or (n_paths, n, 2) batch as returned by
+    simulate_many. x is non decreasing from 0 to 1
+    :param n_points: number of grid points
+    :param endpoint: whether the grid includes t = 1, as in np.linspace
+    :param increments: "arithmetic" for y[t+1] - y[t], "log" for log(y[t+1] / y[t]) of positive prices
+    :return: grid of shape (n_points,), prices of shape (n_points,) or (n_paths, n_points), increments with one less
+    point along the last axis
+    """
+    data = np.asarray(data, dtype=np.float64)
+    paths = data[np.newaxis] if data.ndim == 2 else data
+    n_paths, n = paths.shape[:2]
+
+    grid = np.linspace(0, 1, n_points, endpoint=endpoint)
+    offset = 2. * np.arange(n_paths)[:, np.newaxis]
+    x = paths[..., 0]
+    y = paths[..., 1]
+
+    i = np.searchsorted((x + offset).ravel(), (grid + offset).ravel(), side="right").reshape(n_paths, n_points)
+    i = np.clip(i - np.arange(n_paths)[:, np.newaxis] * n - 1, 0, n - 2)
+
+    x0 = np.take_along_axis(x, i, axis=1)
+    x1 = np.take_along_axis(x, i + 1, axis=1)
+    y0 = np.take_along_axis(y, i, axis=1)
+    y1 = np.take_along_axis(y, i + 1, axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prices = np.where(x1 > x0, (y1 - y0) / (x1 - x0) * (grid - x0) + y0, y0)
+
+    if increments == "arithmetic":
+        diffs = np.diff(prices, axis=-1)
+    elif increments == "log":
+        if np.any(prices <= 0):
+            raise ValueError("Log increments are only defined for positive prices.")
+        diffs = np.diff(np.log(prices), axis=-1)
+    else:
+        raise ValueError("{} is not a supported increment. Supported increments are 'arithmetic' and 'log'.".format(increments))
+
+    if data.ndim == 2:
+        return grid, prices[0], diffs[0]
+
+    return grid, prices, diffs
@@ -1,30 +1,101 @@
 import numpy as np
 from fractalmarkets.mmar.multiplicative_cascade import MutiplicativeCascade
-from scipy import interpolate
+from fractalmarkets.mmar.counter_rng import CounterRNG, get_rng
+from fractalmarkets.instrumentation import NULL_STATS
 
 class TradingTimeCDF:
-    def __init__(self, k_max, M, randomize=False):
+    def __init__(self, k_max, M, randomize=False, rng=None, stats=None):
+        """
+        :param k_max: max depth of the recursion tree
+        :param M: array m0, m1, ..., mb where sum(M) = 1
+        :param randomize: whether or not to shuffle M before assigning mass to child cells. See page 13 of "A Multifractal Model of Asset Returns" 1997
+        :param rng: numpy.random.Generator, CounterRNG or seed used when randomized
+        :param stats: fractalmarkets.instrumentation.Stats, shared with the cascade
+        """
         self.k_max = k_max
         self.M = M
         self.randomize = randomize
+        self.rng = get_rng(rng)
+        self.stats = NULL_STATS if stats is None else stats
         self.cdf = None
         self.cascade = None
-        self.data = []
+        self.table = None
+
+    @property
+    def data(self):
+        """
+        :return: [[x, y], ...] of the CDF on the clock time grid of the cascade, [] before create_trading_time_cdf
+        """
+        if self.table is None:
+            return []
+
+        n = len(self.table) - 1
+        return np.stack([np.append(np.linspace(0, 1, num=n, endpoint=False), 1), self.table], axis=1)
     
-    def create_trading_time_cdf(self):
-        x, y = self._create_trading_time_cdf(self.k_max, self.M, self.randomize)
-        self.data = np.stack([x, y], axis=1)
-        
-        self.cdf = interpolate.interp1d(x, y)
+    def create_trading_time_cdf(self, method="vectorized", rng=None, cache=None):
+        """
+        :param method: method used to build the multiplicative cascade, "vectorized" or "recursive"
+        :param rng: numpy.random.Generator, CounterRNG or seed for this run. Defaults to the generator given to the constructor
+        :param cache: fractalmarkets.mmar.cache.TableCache looked up when the cascade is deterministic, that is not
+        randomized or randomized by a CounterRNG. self.cascade is left None when the table comes from the cache
+        """
+        rng = self.rng if rng is None else get_rng(rng)
+
+        if cache is not None and (not self.randomize or isinstance(rng, CounterRNG)):
+            key = (self.k_max, tuple(float(m) for m in self.M), rng.seed if self.randomize else None)
+            self.table = cache.get(key, lambda: self._create_table(method, rng))
+        else:
+            self.table = self._create_table(method, rng)
+
+        self.cdf = self.evaluate
+
+    def evaluate(self, t):
+        """
+        Piecewise linear CDF of trading time. The cascade lives on a uniform grid of clock time so the cell holding
+        each point is found with index arithmetic rather than a search.
+        :param t: clock time, scalar or array. Values outside of [0, 1] are clamped
+        :return: trading time at t
+        """
+        self.stats.count("cdf_evaluations", np.size(t))
+        n = len(self.table) - 1
+        u = np.clip(np.asarray(t, dtype=np.float64), 0, 1) * n
+        i = np.minimum(u.astype(np.intp), n - 1)
+
+        theta = self.table[i] + (u - i) * (self.table[i + 1] - self.table[i])
+
+        return theta[()]
+
+    def inverse(self, theta):
+        """
+        Inverse CDF mapping trading time back onto clock time.
+        :param theta: trading time, scalar or array. Values outside of [0, 1] are clamped
+        :return: clock time at theta
+        """
+        n = len(self.table) - 1
+
+        return np.interp(np.clip(theta, 0, 1), self.table, np.arange(n + 1) / n)
+
+    def _create_table(self, method="vectorized", rng=None):
+        """
+        :param method: method used to build the multiplicative cascade, "vectorized" or "recursive"
+        :param rng: numpy.random.Generator or CounterRNG
+        :return: contiguous array of the CDF at the b^k_max + 1 grid points of clock time
+        """
+        self.stats.count("cdf_tables_built")
+        x, y = self._create_trading_time_cdf(self.k_max, self.M, self.randomize, method, rng)
+
+        return np.ascontiguousarray(y, dtype=np.float64)
 
-    def _create_trading_time_cdf(self, k_max, M, randomize=False):
+    def _create_trading_time_cdf(self, k_max, M, randomize=False, method="vectorized", rng=None):
         """
         :param k_max: max depth of the recursion tree
         :param M: array m0, m1, ..., mb where sum(M) = 1
         :param randomize: whether or not to shuffle M before assigning mass to child cells. See page 13 of "A Multifractal Model of Asset Returns" 1997
+        :param method: method used to build the multiplicative cascade, "vectorized" or "recursive"
+        :param rng: numpy.random.Generator
         :return: [x, ...], [y, ...] corresponding to cdf of trading time
         """
-        self.cascade = MutiplicativeCascade(k_max, M, randomize)
-        self.cascade.cascade()
+        self.cascade = MutiplicativeCascade(k_max, M, randomize, rng=rng, stats=self.stats)
+        self.cascade.cascade(method=method)
 
-        return self.cascade.data[:,0], np.cumsum(self.cascade.data[:,1]) / (len(self.cascade.data) - 1)
\ No newline at end of file
+        return self.cascade.data[:,0], np.cumsum(self.cascade.data[:,1]) / (len(self.cascade.data) - 1)
@@ -0,0 +1,96 @@
+import numpy as np
+import math
+
+def get_state_space(m_0, k_bar):
+    '''
+    Enumerates the 2^k_bar volatility states. Component k of state s is m_0 when bit k of s, counted from the most
+    significant of k_bar bits, is 0 and 2 - m_0 otherwise, matching the ordering of get_transition_matrix.
+    :param m_0: multiplier value, the other value being 2 - m_0 as drawn by _binomial_M
+    :param k_bar: number of volatility frequencies
+    :return: (2^k_bar x k_bar) array of multipliers
+    '''
+    bits = (np.arange(2**k_bar)[:, np.newaxis] >> np.arange(k_bar - 1, -1, -1)) & 1
+
+    return np.where(bits == 0, m_0, 2. - m_0)
+
+def get_transition_probabilities(gamma_1, b, k_bar):
+    '''
+    Probabilities of state transition for each volatility frequency, gamma_k = 1 - (1 - gamma_1)^(b^(k - 1)) as in
+    equation 2.2 of Calvet & Fisher's Regime-Switching and the Estimation of Multifractal Processes. Some literature
+    expresses it as gamma_k = 1 - (1 - gamma_1)^(b^(k - k_bar)) instead.
+    :param gamma_1: transition probability of the lowest frequency
+    :param b: growth of the transition frequencies
+    :param k_bar: number of volatility frequencies
+    :return: gamma_k for each frequency, starting at gamma_1
+    '''
+    return np.array([gamma_1] + [1 - (1 - gamma_1) ** (b ** (k - 1)) for k in range(1, k_bar)], dtype=np.float64)
+
+def get_transition_matrix(transition_probabilities):
+    '''
+    Dense transition matrix of the state space. Frequency k is redrawn with probability gamma_k and a redraw lands on
+    either multiplier with probability 1/2, so it flips with probability gamma_k / 2. Components are independent so the
+    matrix is the Kronecker product of the per frequency 2 x 2 matrices.
+    :param transition_probabilities: gamma_k for each frequency
+    :return: (2^k_bar x 2^k_bar) row stochastic matrix
+    '''
+    A = np.ones((1, 1))
+    for gamma in transition_probabilities:
+        A = np.kron(A, np.array([[1 - gamma / 2, gamma / 2], [gamma / 2, 1 - gamma / 2]]))
+
+    return A
+
+def _predict(probabilities, transition_probabilities):
+    '''
+    Multiplies state probabilities by the transition matrix one frequency at a time, O(k_bar 2^k_bar) rather than
+    O(4^k_bar) for the dense matrix.
+    :param probabilities: 2^k_bar state probabilities
+    :param transition_probabilities: gamma_k for each frequency
+    :return: 2^k_bar predicted state probabilities
+    '''
+    k_bar = len(transition_probabilities)
+    for k, gamma in enumerate(transition_probabilities):
+        p = probabilities.reshape(-1, 2, 2**(k_bar - 1 - k))
+        probabilities = ((1 - gamma / 2) * p + (gamma / 2) * p[:, ::-1, :]).reshape(-1)
+
+    return probabilities
+
+def hamilton_filter(returns, m_0, sigma_bar, transition_probabilities, chunk_size=1024):
+    '''
+    Forward filter of the Markov switching multifractal. Returns are N(0, sigma_t^2) with
+    sigma_t = sigma_bar * prod(M_t) as in MarkovSwitchingMultifractal.timestep. Observation densities are evaluated for a
+    chunk of timesteps and all states at once, in log space scaled by the most likely state of each timestep so returns
+    far in the tails do not underflow every density. The prediction step uses the Kronecker structure of the transitions.
+    :param returns: 1D array of returns
+    :param m_0: multiplier value
+    :param sigma_bar: unconditional scale of returns
+    :param transition_probabilities: gamma_k for each frequency
+    :param chunk_size: number of timesteps whose densities are held in memory at once
+    :return: log likelihood, filtered volatility E[sigma_t | r_1..r_t], (timesteps x k_bar) filtered probabilities that
+    M_k,t = m_0
+    '''
+    returns = np.asarray(returns, dtype=np.float64)
+    k_bar = len(transition_probabilities)
+    states = get_state_space(m_0, k_bar)
+    sigma = sigma_bar * np.prod(states, axis=1)
+
+    filtered_volatility = np.empty(len(returns))
+    filtered_probabilities = np.empty((len(returns), k_bar))
+    log_likelihood = 0.
+
+    probabilities = np.full(2**k_bar, 1. / 2**k_bar) # each frequency starts equally likely in either state
+    for start in range(0, len(returns), chunk_size):
+        r = returns[start:start + chunk_size, np.newaxis]
+        log_densities = -0.5 * (r / sigma)**2 - np.log(math.sqrt(2 * math.pi) * sigma)
+        scales = np.max(log_densities, axis=1) # densities of outliers underflow in every state, scale them back up
+        densities = np.exp(log_densities - scales[:, np.newaxis])
+
+        for t, density in enumerate(densities):
+            joint = _predict(probabilities, transition_probabilities) * density
+            likelihood = max(np.sum(joint), np.finfo(np.float64).tiny)
+            probabilities = joint / likelihood
+
+            log_likelihood += math.log(likelihood) + scales[t]
+            filtered_volatility[start + t] = probabilities @ sigma
+            filtered_probabilities[start + t] = probabilities @ (states == m_0)
+
+    return log_likelihood, filtered_volatility, filtered_probabilities
@@ -1,9 +1,12 @@
 import numpy as np
+from scipy.optimize import minimize
+from fractalmarkets.msm.estimation import hamilton_filter, get_transition_probabilities
+from fractalmarkets.instrumentation import NULL_STATS
 
 
 class MarkovSwitchingMultifractal(object):
 
-    def __init__(self, m_0=1.4, mu=0.1, sigma_bar=0.05, b=3.0, gamma_1=0.3, k_bar=5, timesteps=1000):
+    def __init__(self, m_0=1.4, mu=0.1, sigma_bar=0.05, b=3.0, gamma_1=0.3, k_bar=5, timesteps=1000, rng=None, stats=None):
         assert 0. < m_0 <= 2.0, "m_0 must be within [0,2]"
         self.m_0 = m_0
         self.mu = mu
@@ -16,70 +19,78 @@ class MarkovSwitchingMultifractal(object):
         self.k_bar = k_bar
         assert type(timesteps) == int and timesteps > 1, "timesteps must be an integer greater than 1"
         self.timesteps = timesteps
-
+        # numpy.random.Generator or seed. A Generator must not be shared between threads
+        self.rng = np.random.default_rng(rng)
+        # fractalmarkets.instrumentation.Stats recording stage times, simulated paths and likelihood evaluations
+        self.stats = NULL_STATS if stats is None else stats
 
         # compute transition probabilities for each k:
-        self.transition_probabilities = np.zeros(self.k_bar)
-        self.transition_probabilities[0] = self.gamma_1
-        for k in range(1, self.k_bar):
-            gamma_k = self._get_transition_probability(k)
-            self.transition_probabilities[k] = gamma_k
+        self.transition_probabilities = self._get_transition_probabilities()
         # print('Transition probabilities = {}'.format(self.transition_probabilities))
 
         # initialise the state vector
-        self.M = np.zeros(self.k_bar)
-        for k in range(self.k_bar):
-            self.M[k] = self._binomial_M()
+        self.M = self._binomial_M(size=self.k_bar)
         # print('Initial state vector = {}'.format(self.M))
 
-    def _get_transition_probability(self, k):
+    def _get_transition_probabilities(self):
         '''
-        Compute the probabilities of transition between different states for each volatility frequency k
-        :param k: the kth index
-        :return: the probability of state transition at the kth level
+        :return: the probability of state transition for each volatility frequency
         '''
-        # I've seen some literature express this equation as:
-        # gamma_k = 1 - (1 - self.gamma_1)**(self.b**(k - self.k_bar))
-
-        # But Calvet & Fisher's original paper Regime-Switching and the Estimation of Multifractal Processes
-        # expresses the following (Equation 2.2)
-        gamma_k = 1 - (1 - self.gamma_1) ** (self.b ** (k - 1))
-        return gamma_k
+        return get_transition_probabilities(self.gamma_1, self.b, self.k_bar)
 
-    def _binomial_M(self):
+    def _binomial_M(self, size=None, rng=None):
         '''
         The distribution from which values of M are drawn. Currently binomial but this could
         be extended to multinomial or lognormal.
+        :param size: number of samples drawn in one batch. None draws a single sample
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
         :return: A sample from the M distribution
         '''
-        if np.random.random() < 0.5:
-            return self.m_0
-        else:
-            return 2. - self.m_0
+        rng = self.rng if rng is None else rng
+        return np.where(rng.random(size) < 0.5, self.m_0, 2. - self.m_0)[()]
 
-    def _update_state_vector(self):
+    def _update_state_vector(self, rng=None):
         '''
         Using the given probabilities of state transition, update the state
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
         '''
-        for k in range(self.k_bar):
-            if np.random.random() < self.transition_probabilities[k]:
-                # draw M_k_t from the distribution for M
-                self.M[k] = self._binomial_M()
+        rng = self.rng if rng is None else rng
+        switch = rng.random(self.k_bar) < self.transition_probabilities
+        # draw M_k_t from the distribution for M
+        self.M[switch] = self._binomial_M(size=np.count_nonzero(switch), rng=rng)
 
-    def timestep(self):
+    def timestep(self, rng=None):
         '''
         Run an update to the state vector and generate a new value of returns for the current timestep
+        :param rng: numpy.random.Generator. Defaults to the generator given to the constructor
         :return: r_t: float - the value of returns for timestep t
         '''
+        rng = self.rng if rng is None else rng
         # update state vector according to transition probabilities
-        self._update_state_vector()
+        self._update_state_vector(rng)
         # calculate this timesep's sigma value
         sigma = self.standard_deviation_bar * np.prod(self.M)
-        r_t = sigma * np.random.normal(loc=0, scale=1)
+        r_t = sigma * rng.normal(loc=0, scale=1)
         return r_t
 
-    def simulate(self):
-        returns = np.array([self.timestep() for _ in range(self.timesteps)])
+    def simulate(self, method="vectorized", rng=None):
+        '''
+        :param method: "vectorized" draws every timestep at once, "iterative" runs timestep() once per step
+        :param rng: numpy.random.Generator or seed for this run. Defaults to the generator given to the constructor
+        :return: [[t, price], ...] array of shape (timesteps, 2)
+        '''
+        rng = self.rng if rng is None else np.random.default_rng(rng)
+        if method == "vectorized":
+            returns, states = self._simulate_returns_vectorized(self.M[np.newaxis], rng)
+            returns = returns[0]
+            self.M = states[0]
+        elif method == "iterative":
+            with self.stats.stage("timesteps"):
+                returns = np.array([self.timestep(rng) for _ in range(self.timesteps)])
+            self.stats.count("paths")
+        else:
+            raise ValueError("{} is not a supported method. Supported methods are 'vectorized' and 'iterative'.".format(method))
+
         # The original paper models returns, so convert these to raw price values
         prices = self._returns_to_prices(returns)
         # join with an array of time values
@@ -87,31 +98,169 @@ class MarkovSwitchingMultifractal(object):
         times /= len(times)
         return np.column_stack((times, prices))
 
+    def simulate_many(self, n_paths, chunk_size=None, rng=None):
+        '''
+        Simulates independent paths sharing the transition probabilities of this process. Each path starts from its
+        own draw of the state vector, the state vector of this process is left untouched. A seeded run is reproducible
+        for a given chunk_size.
+        :param n_paths: number of paths
+        :param chunk_size: number of paths simulated per vectorized pass. Bounds the memory of the intermediate
+        (chunk_size x timesteps x k_bar) arrays
+        :param rng: numpy.random.Generator or seed for this run. Defaults to the generator given to the constructor
+        :return: [[[t, price], ...], ...] array of shape (n_paths, timesteps, 2)
+        '''
+        paths = np.empty((n_paths, self.timesteps, 2))
+
+        start = 0
+        for chunk in self.iter_simulate_many(n_paths, chunk_size=chunk_size, rng=rng):
+            paths[start:start + len(chunk)] = chunk
+            start += len(chunk)
+
+        return paths
+
+    def iter_simulate_many(self, n_paths, chunk_size=None, rng=None):
+        '''
+        Streaming counterpart of simulate_many.
+        :param n_paths: number of paths
+        :param chunk_size: number of paths simulated per vectorized pass. Defaults to about 2^22 state entries per pass
+        :param rng: numpy.random.Generator or seed for this run. Defaults to the generator given to the constructor
+        :return: iterator of arrays of shape (chunk_size, timesteps, 2)
+        '''
+        rng = self.rng if rng is None else np.random.default_rng(rng)
+        if chunk_size is None:
+            chunk_size = max(1, 2**22 // (self.timesteps * self.k_bar))
+
+        times = np.float32(np.arange(0, self.timesteps))
+        times /= len(times)
+
+        for start in range(0, n_paths, chunk_size):
+            n = min(chunk_size, n_paths - start)
+            returns, _ = self._simulate_returns_vectorized(self._binomial_M(size=(n, self.k_bar), rng=rng), rng)
+
+            chunk = np.empty((n, self.timesteps, 2))
+            chunk[:, :, 0] = times
+            with self.stats.stage("returns_to_prices"):
+                chunk[:, :, 1] = self._returns_to_prices(returns)
+            self.stats.allocate("paths", chunk.nbytes)
+            yield chunk
+
+    def _simulate_returns_vectorized(self, initial_M, rng):
+        '''
+        Draws the (n_paths x timesteps x k_bar) switch mask and candidate multipliers at once. Each frequency holds the
+        multiplier drawn at its last switch, found with a running maximum over the switch times, or its initial state
+        before the first switch.
+        :param initial_M: (n_paths x k_bar) state vectors before the first timestep
+        :param rng: numpy.random.Generator
+        :return: (n_paths x timesteps) returns, (n_paths x k_bar) state vectors after the final timestep
+        '''
+        n_paths = len(initial_M)
+        shape = (n_paths, self.timesteps, self.k_bar)
+        paths = np.arange(n_paths)[:, np.newaxis, np.newaxis]
+        steps = np.arange(self.timesteps)[np.newaxis, :, np.newaxis]
+        frequencies = np.arange(self.k_bar)
+
+        with self.stats.stage("draw_switches"):
+            switch = rng.random(shape) < self.transition_probabilities
+            draws = self._binomial_M(size=shape, rng=rng)
+
+        with self.stats.stage("fill_states"):
+            last_switch = np.maximum.accumulate(np.where(switch, steps, -1), axis=1)
+            states = np.where(last_switch >= 0, draws[paths, last_switch, frequencies], initial_M[:, np.newaxis, :])
+
+        with self.stats.stage("draw_returns"):
+            sigma = self.standard_deviation_bar * np.prod(states, axis=2)
+            returns = sigma * rng.normal(loc=0, scale=1, size=(n_paths, self.timesteps))
+
+        self.stats.count("paths", n_paths)
+        self.stats.allocate("states", switch.nbytes + draws.nbytes + last_switch.nbytes + states.nbytes)
+
+        return returns, states[:, -1].copy()
+
     def _returns_to_prices(self, returns, same_size=True, unit_scale=True):
         '''
         Calvet & Fisher's paper models returns rather than raw prices, so convert the time series
         of returns to a time series of prices.
-        :param returns: array of returns at each timestep
+        :param returns: array of returns at each timestep, or (n_paths x timesteps) array of returns
         :param same_size: Assuming a starting price of self.mu, the resulting price array would have one more element
         than the input returns array. Setting same_size=True will clip the first value of prices to make it equal length
         to the input array
         :return: corresponding array of prices at each timestep
         '''
         # convert to raw prices
-        prices = [1.0] # is this a good choice of initialisation?
-        for i, ret in enumerate(returns):
-            p_t = prices[i] * np.exp(ret)
-            prices.append(p_t)
-        prices = np.array(prices)
+        prices = np.empty(returns.shape[:-1] + (returns.shape[-1] + 1,))
+        prices[..., 0] = 1.0 # is this a good choice of initialisation?
+        prices[..., 1:] = np.exp(np.cumsum(returns, axis=-1))
         prices -= 1.0 # recentre starting price at 0 (because it needed a non-zero initialization)
         if same_size:
-            prices = prices[1:]
+            prices = prices[..., 1:]
 
         # rescale prices to unit interval?
         if unit_scale:
-            min = np.min(prices)
-            max = np.max(prices)
+            min = np.min(prices, axis=-1, keepdims=True)
+            max = np.max(prices, axis=-1, keepdims=True)
             range = max-min
             prices /= range
 
         return prices
+
+    def fit(self, returns, maxiter=200):
+        '''
+        Maximum likelihood estimate of m_0, sigma_bar, b and gamma_1 for the k_bar of this process, evaluating the
+        likelihood with fractalmarkets.msm.estimation.hamilton_filter. The fitted parameters replace those of this
+        process and the state vector is redrawn.
+        :param returns: 1D array of returns, zero mean as generated by timestep()
+        :param maxiter: max number of optimizer iterations
+        :return: dict of the fitted parameters, log likelihood, filtered volatility and filtered probabilities that each
+        frequency is in state m_0
+        '''
+        returns = np.asarray(returns, dtype=np.float64)
+
+        def negative_log_likelihood(params):
+            m_0, sigma_bar, b, gamma_1 = params
+            self.stats.count("likelihood_evaluations")
+            with self.stats.stage("hamilton_filter"):
+                return -hamilton_filter(returns, m_0, sigma_bar, get_transition_probabilities(gamma_1, b, self.k_bar))[0]
+
+        # m_0 and 2 - m_0 describe the same process so m_0 is restricted to [1, 2)
+        m_0 = min(max(self.m_0, 2. - self.m_0), 1.99)
+        sigma_bar = np.std(returns) / ((m_0**2 + (2. - m_0)**2) / 2) ** (self.k_bar / 2)
+        bounds = [(1., 1.999), (1e-12, None), (1., 100.), (1e-6, 1.)]
+        with self.stats.stage("fit"):
+            result = minimize(negative_log_likelihood, [m_0, sigma_bar, self.b, self.gamma_1], method="L-BFGS-B", bounds=bounds, options={"maxiter": maxiter})
+
+        self.m_0, self.standard_deviation_bar, self.b, self.gamma_1 = (float(p) for p in result.x)
+        self.transition_probabilities = self._get_transition_probabilities()
+        self.M = self._binomial_M(size=self.k_bar)
+
+        log_likelihood, filtered_volatility, filtered_probabilities = hamilton_filter(returns, self.m_0, self.standard_deviation_bar, self.transition_probabilities)
+
+        return {
+            "m_0": self.m_0,
+            "sigma_bar": self.standard_deviation_bar,
+            "b": self.b,
+            "gamma_1": self.gamma_1,
+            "log_likelihood": log_likelihood,
+            "filtered_volatility": filtered_volatility,
+            "filtered_probabilities": filtered_probabilities,
+            "success": result.success,
+        }
+
+
+def simulate_parameter_grid(parameter_sets, n_paths, timesteps=1000, chunk_size=None, rng=None):
+    '''
+    Simulates a block of paths for every parameter set of a calibration grid.
+    :param parameter_sets: iterable of (m_0, sigma_bar, b, gamma_1, k_bar)
+    :param n_paths: number of paths per parameter set
+    :param timesteps: number of timesteps per path
+    :param chunk_size: number of paths simulated per vectorized pass
+    :param rng: numpy.random.Generator or seed shared by the whole grid
+    :return: {(m_0, sigma_bar, b, gamma_1, k_bar): array of shape (n_paths, timesteps, 2)}
+    '''
+    rng = np.random.default_rng(rng)
+
+    results = {}
+    for m_0, sigma_bar, b, gamma_1, k_bar in parameter_sets:
+        msm = MarkovSwitchingMultifractal(m_0=m_0, sigma_bar=sigma_bar, b=b, gamma_1=gamma_1, k_bar=k_bar, timesteps=timesteps, rng=rng)
+        results[(m_0, sigma_bar, b, gamma_1, k_bar)] = msm.simulate_many(n_paths, chunk_size=chunk_size)
+
+    return results
@@ -3,41 +3,41 @@ import math
 
 def to_log_returns_series(x):
     """
-    :param x: 1D array of numbers
-    :return: 1D array of log returns
+    :param x: 1D array of numbers, or 2D array with one series per row
+    :return: 1D array of log returns, or 2D array with one series per row
     """
-    log_returns = np.log(x[1:]/x[:-1])
+    log_returns = np.log(x[..., 1:]/x[..., :-1])
 
     return log_returns
 
 def get_obv(x):
     """
-    :param x: 1D array
+    :param x: 1D array, or 2D array with one series per row
     :return: number of observations to the lower 100 + 2. Since AR(1) residual is passed on to R/S, we lose two points along the way.
              Thus, we need to start with two more observations than we wish to pass to the R/S section.
     """
-    obv = math.floor((len(x)-1)/100)*100 + 2
+    obv = math.floor((np.shape(x)[-1]-1)/100)*100 + 2
 
     return obv
 
 def get_ar1_residuals(x):
     """
-    :param x: 1D array of numbers
-    :return: 1D array of AR(1) residuals
+    :param x: 1D array of numbers, or 2D array with one series per row
+    :return: 1D array of AR(1) residuals, or 2D array with one series per row
     """
     # calculate AR(1) residuals to remove autocorrelation and make data stationary as per Peters FMH p.281
-    yi   = x[1:]
-    xi   = x[:-1]
+    yi   = x[..., 1:]
+    xi   = x[..., :-1]
     xi2  = np.power(xi, 2)
-    ybar = np.mean(yi)
-    xbar = np.mean(xi)
+    ybar = np.mean(yi, axis=-1, keepdims=True)
+    xbar = np.mean(xi, axis=-1, keepdims=True)
     xy   = np.multiply(yi,xi)
-    sxx  = len(x) * np.sum(xi2) - np.power(np.sum(xi), 2)
-    sxy  = len(x) * np.sum(xy) - np.sum(xi) * np.sum(yi)
+    sxx  = x.shape[-1] * np.sum(xi2, axis=-1, keepdims=True) - np.power(np.sum(xi, axis=-1, keepdims=True), 2)
+    sxy  = x.shape[-1] * np.sum(xy, axis=-1, keepdims=True) - np.sum(xi, axis=-1, keepdims=True) * np.sum(yi, axis=-1, keepdims=True)
     slope = sxy / sxx
     const = ybar - slope*xbar
 
-    ar1_residuals = x[1:] - (const + slope * x[:-1])
+    ar1_residuals = x[..., 1:] - (const + slope * x[..., :-1])
 
     return ar1_residuals
 
@@ -48,7 +48,9 @@ def compute_ers(n):
     E(R/S_n) = ((n - 0.5) / n) * ( n * pi/2 )^-0.5 * sum(r=1 -> n-1, sqrt((n-r)/r))
     """
 
-    return ((n - 0.5) / n) * math.pow(n * (math.pi / 2), -0.5) * np.sum(np.array([ math.sqrt((n-r)/r) for r in range(1, n-1) ]))
+    r = np.arange(1, n-1)
+
+    return ((n - 0.5) / n) * math.pow(n * (math.pi / 2), -0.5) * np.sum(np.sqrt((n-r)/r))
 
 def get_rs(x):
     """
@@ -66,32 +68,65 @@ def get_rs(x):
 
     return R / S
 
+def get_rs_windows(x):
+    """
+    Vectorized get_rs over the last axis.
+    :param x: array of windows, one window per row
+    :return: array of R/S, one per window
+    """
+    mean_x = np.sum(x, axis=-1, keepdims=True) / x.shape[-1]
+    rescaled_x = x - mean_x
+    Z = np.cumsum(rescaled_x, axis=-1)
+    R = np.max(Z, axis=-1) - np.min(Z, axis=-1)
+    S = np.std(x, axis=-1, ddof=0)
+
+    rs = np.zeros(R.shape)
+    np.divide(R, S, out=rs, where=(R != 0) & (S != 0))
+
+    return rs
+
+def get_window_sizes(obv):
+    """
+    :param obv: number of observations
+    :return: window sizes n > 9 dividing obv evenly, largest first
+    """
+    i = np.arange(1, obv)
+    n = obv // i
+
+    return n[(obv % i == 0) & (n > 9)] # small values of n produce unstable estimates when sample size is small
+
 def get_rs_data(x):
     """
-    :param x: 1D array of numbers
-    :return: number representing R/S rescaled range
-    """
-    i = 0 
-    obv = len(x)
-    RS = []
-    N  = []
-    while i < obv - 1:
-        i += 1
-        n   = math.floor(obv/i)
-        num = obv/i
-        rs = []
-        if n >= num and n > 9: # small values of n produce unstable estimates when sample size is small
-            for start in range(0, len(x), n):
-                rs.append(get_rs(x[start:start + n]))
-            RS.append(np.mean(rs))
-            N.append(n)
-
-    return [np.array(N).astype(int), np.array(RS)]
+    :param x: 1D array of numbers, or 2D array with one series per row
+    :return: number representing R/S rescaled range. RS holds one row per series for 2D input
+    """
+    obv = x.shape[-1]
+    N = get_window_sizes(obv)
+    RS = [np.mean(get_rs_windows(x.reshape(x.shape[:-1] + (-1, n))), axis=-1) for n in N]
+    RS = np.stack(RS, axis=-1) if RS else np.empty(x.shape[:-1] + (0,))
+
+    return [N.astype(int), RS]
 
 def get_Hc(rs_data, max_n=-1):
+    """
+    :param rs_data: [N, RS] as returned by get_rs_data. RS may also hold one row of R/S values per series
+    :param max_n: largest window size included in the fit, -1 for all
+    :return: Hurst exponent and constant, or arrays of both with one entry per series
+    """
     N = rs_data[0] if max_n == -1 else rs_data[0][np.where(rs_data[0] <= max_n)]
-    RS = rs_data[1][:len(N)]
+    RS = rs_data[1][..., :len(N)]
     A = np.vstack([np.log10(N), np.ones(len(N))]).T # y = Ap, where A = [[x 1]] and p = [[m], [c]]
-    H, c = np.linalg.lstsq(A, np.log10(RS), rcond=-1)[0] # slope (Hurst exponent), intercept (constant); WRT Peters FMH p. 56 eq 4.7 (R/S)_n = c*n^H
+    H, c = np.linalg.lstsq(A, np.log10(RS).T, rcond=-1)[0] # slope (Hurst exponent), intercept (constant); WRT Peters FMH p. 56 eq 4.7 (R/S)_n = c*n^H
+
+    return H, c
+
+def get_vstat_cycles(rs_data):
+    """
+    :param rs_data: [N, RS] as returned by get_rs_data, largest window size first
+    :return: window sizes at which the V statistic RS/sqrt(N) rises over the previous (larger) window size
+    """
+    N, RS = rs_data
+    vstat = RS / np.sqrt(N)
+
+    return np.round(N[1:][vstat[1:] > vstat[:-1]], 0).astype(float)
 
-    return H, c
\ No newline at end of file
@@ -0,0 +1,80 @@
+from fractalmarkets.rs.metrics import get_obv, to_log_returns_series, get_ar1_residuals, get_rs_data, get_Hc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+class MultiRS:
+    def __init__(self, y, n_workers=1):
+        """
+        R/S analysis of many series at once. Series of equal length are stacked and analyzed along the series axis in a
+        single pass, groups of ragged series are spread over a process pool.
+        :param y: (n_series x n_obs) ndarray, or dict of {name: 1D ndarray} for series of different lengths
+        :param n_workers: number of worker processes for ragged series. None uses every cpu, 1 runs in the calling process
+        """
+        if type(y).__module__ == 'numpy' and np.ndim(y) == 2:
+            self.y = {i: row for i, row in enumerate(y)}
+            self.groups = [(list(self.y), y)]
+        elif isinstance(y, dict):
+            self.y = y
+            self.groups = self._group_by_obv(y)
+        else:
+            raise TypeError("{} is not a supported type for y. Supported types for y are a 2D 'numpy.ndarray' and a dict of 1D 'numpy.ndarray'.".format(type(y)))
+
+        self.n_workers = n_workers
+
+    def analyze(self):
+        """
+        :return: {name: [N, RS]} as returned by get_rs_data for each series
+        """
+        if self.n_workers == 1 or len(self.groups) == 1:
+            results = [_analyze_block(block) for _, block in self.groups]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                results = list(executor.map(_analyze_block, [block for _, block in self.groups]))
+
+        data = {}
+        for (names, _), (N, RS) in zip(self.groups, results):
+            for name, rs in zip(names, RS):
+                data[name] = [N, rs]
+
+        return data
+
+    def get_Hc(self, max_n=-1):
+        """
+        :param max_n: largest window size included in the fit, -1 for all
+        :return: {name: (H, c)} for each series
+        """
+        return {name: (H, c) for name, (H, c, _, _) in self.get_table(max_n=max_n).items()}
+
+    def get_table(self, max_n=-1):
+        """
+        :param max_n: largest window size included in the fit, -1 for all
+        :return: {name: (H, c, N, RS)} for each series
+        """
+        table = {}
+        for name, (N, RS) in self.analyze().items():
+            H, c = get_Hc([N, RS], max_n=max_n)
+            table[name] = (H, c, N, RS)
+
+        return table
+
+    def _group_by_obv(self, y):
+        """
+        :param y: dict of {name: 1D ndarray}
+        :return: [(names, (n_series x obv) block)] for every distinct number of observations passed on to R/S
+        """
+        groups = {}
+        for name, series in y.items():
+            groups.setdefault(min(get_obv(series), len(series)), []).append(name)
+
+        return [(names, np.stack([y[name][:obv] for name in names])) for obv, names in groups.items()]
+
+def _analyze_block(y):
+    """
+    :param y: (n_series x n_obs) ndarray
+    :return: N, (n_series x len(N)) array of R/S
+    """
+    obv = get_obv(y)
+    logs = to_log_returns_series(y[:, :obv])
+    residuals = get_ar1_residuals(logs)
+
+    return get_rs_data(residuals)
@@ -0,0 +1,137 @@
+from fractalmarkets.rs.metrics import get_obv, get_ar1_residuals, get_rs_data, get_Hc, get_window_sizes, compute_ers
+from fractalmarkets.cache import get_cache_dir, save_array
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import hashlib
+import os
+
+_ers_table = np.array([np.nan])
+
+def get_ers_table(n_max, cache_dir=None):
+    """
+    E(R/S)_n of compute_ers for every n up to n_max. The table is kept in memory and persisted as a .npy file, and is
+    only extended when a larger n_max is requested. When the cache directory cannot be read or written the table is
+    kept in memory only.
+    :param n_max: largest n of the table
+    :param cache_dir: directory of the persisted table. Defaults to get_cache_dir("rs")
+    :return: 1D array indexed by n, nan at n = 0
+    """
+    global _ers_table
+    if len(_ers_table) > n_max:
+        return _ers_table
+
+    try:
+        path = os.path.join(_get_directory(cache_dir), "ers.npy")
+        table = np.load(path) if os.path.exists(path) else np.array([np.nan])
+    except OSError:
+        path = None
+        table = _ers_table
+
+    if len(table) <= n_max:
+        n_cached = len(table)
+        table = np.concatenate([table, np.empty(n_max + 1 - n_cached)])
+        for n in range(max(n_cached, 1), n_max + 1):
+            table[n] = compute_ers(n)
+
+        if path is not None:
+            try:
+                save_array(path, table)
+            except OSError:
+                pass
+
+    _ers_table = table
+
+    return table
+
+def get_ers(n, cache_dir=None):
+    """
+    :param n: int or array of window sizes
+    :return: E(R/S) as per compute_ers, looked up in get_ers_table
+    """
+    n = np.asarray(n, dtype=int)
+
+    return get_ers_table(max(int(np.max(n, initial=0)), 1), cache_dir)[n]
+
+def simulate_null_rs(length, n_sims=1000, seed=None, n_workers=None, chunk_size=256, cache_dir=None):
+    """
+    R/S curves of Gaussian random walks of length prices, analyzed as RS(y).analyze() would. Simulation i draws its
+    log returns from a generator seeded by child i of np.random.SeedSequence(seed), so the curves do not depend on
+    n_workers or chunk_size. Seeded runs are cached on disk keyed by (length, window sizes, seed, n_sims), unless the
+    cache directory cannot be written.
+    :param length: number of prices of each simulated series
+    :param n_sims: number of simulated series
+    :param seed: seed of the simulations. None disables the disk cache
+    :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+    :param chunk_size: number of series analyzed per vectorized pass
+    :param cache_dir: directory of the cached curves. Defaults to get_cache_dir("rs")
+    :return: [N, RS] with one row of RS per simulation
+    """
+    obv = min(get_obv(range(length)), length)
+    N = get_window_sizes(obv - 2)
+
+    path = None
+    if seed is not None:
+        key = hashlib.sha1(np.ascontiguousarray(N)).hexdigest()[:16]
+        try:
+            path = os.path.join(_get_directory(cache_dir), "null_rs_{}_{}_{}_{}.npy".format(length, key, seed, n_sims))
+            if os.path.exists(path):
+                return [N.astype(int), np.load(path, mmap_mode="r")]
+        except OSError:
+            path = None
+
+    seeds = np.random.SeedSequence(seed).spawn(n_sims)
+    chunks = [(seeds[i:i + chunk_size], obv - 1) for i in range(0, n_sims, chunk_size)]
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    if n_workers == 1 or len(chunks) == 1:
+        RS = [_simulate_null_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            RS = list(executor.map(_simulate_null_chunk, *zip(*chunks)))
+    RS = np.concatenate(RS) if RS else np.empty((0, len(N)))
+
+    if path is not None:
+        try:
+            save_array(path, RS)
+        except OSError:
+            pass
+
+    return [N.astype(int), RS]
+
+def get_H_pvalue(H, length, max_n=-1, n_sims=1000, seed=0, n_workers=None, cache_dir=None):
+    """
+    One sided significance of a Hurst exponent against Gaussian random walks of the same length.
+    :param H: Hurst exponent estimated by RS(y).get_Hc(max_n)
+    :param length: number of prices of y
+    :param max_n: largest window size included in the fit, -1 for all
+    :param n_sims: number of simulated series
+    :param seed: seed of the simulations, see simulate_null_rs
+    :param n_workers: number of worker processes
+    :param cache_dir: directory of the cached curves
+    :return: fraction of simulated series with an estimated H at least as large
+    """
+    null_H, _ = get_Hc(simulate_null_rs(length, n_sims, seed=seed, n_workers=n_workers, cache_dir=cache_dir), max_n=max_n)
+
+    return np.mean(null_H >= H)
+
+def _get_directory(cache_dir=None):
+    """
+    :param cache_dir: directory of persisted tables, created if missing. Defaults to get_cache_dir("rs")
+    :return: cache directory
+    """
+    if cache_dir is None:
+        return get_cache_dir("rs")
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    return cache_dir
+
+def _simulate_null_chunk(seeds, n_logs):
+    """
+    :param seeds: list of np.random.SeedSequence, one per series
+    :param n_logs: number of log returns per series
+    :return: (len(seeds) x len(N)) array of R/S
+    """
+    logs = np.stack([np.random.default_rng(s).standard_normal(n_logs) for s in seeds])
+
+    return get_rs_data(get_ar1_residuals(logs))[1]
@@ -0,0 +1,74 @@
+from fractalmarkets.rs.metrics import to_log_returns_series
+import numpy as np
+
+def get_time_scales(obv, n_scales=20, max_dt=None):
+    """
+    :param obv: number of observations
+    :param n_scales: number of log spaced time scales
+    :param max_dt: largest time scale. Defaults to obv / 10 so every scale spans at least 10 intervals
+    :return: unique integer time scales from 1 to max_dt
+    """
+    max_dt = max(obv // 10, 1) if max_dt is None else max_dt
+
+    return np.unique(np.logspace(0, np.log10(max_dt), n_scales).astype(int))
+
+def get_partition_function(y, q, dt=None, chunk_size=2**16):
+    """
+    Partition function S_q(dt) = sum_i |X(i dt + dt) - X(i dt)|^q of the log price X(t) = ln y(t) - ln y(0) over
+    non-overlapping intervals, as per Calvet, Fisher & Mandelbrot "Large Deviations and the Distribution of Price Changes"
+    1997. X is the prefix sum of the log returns so every increment is a difference of two of its entries, and the
+    whole grid of moments is raised at once as exp(q log|dX|). Zero increments are left out so that S_q stays finite
+    for q <= 0.
+    :param y: 1D array of prices
+    :param q: 1D array of moments
+    :param dt: 1D array of integer time scales in observations. Defaults to get_time_scales
+    :param chunk_size: number of increments raised to every moment at once
+    :return: dt, (len(q) x len(dt)) array of S_q(dt)
+    """
+    logs = to_log_returns_series(y)
+    X = np.concatenate([[0], np.cumsum(logs)])
+    q = np.asarray(q, dtype=np.float64)
+    dt = get_time_scales(len(logs)) if dt is None else np.asarray(dt, dtype=int)
+
+    S = np.zeros((len(q), len(dt)))
+    for j, d in enumerate(dt):
+        n = len(logs) // d
+        increments = np.abs(X[d:n*d + 1:d] - X[:n*d:d])
+        log_increments = np.log(increments[increments > 0])
+
+        for start in range(0, len(log_increments), chunk_size):
+            S[:, j] += np.sum(np.exp(np.outer(q, log_increments[start:start + chunk_size])), axis=1)
+
+    return dt, S
+
+def get_tau(dt, S):
+    """
+    Scaling function from log S_q(dt) = tau(q) log dt + c_q, since S_q sums T / dt increments with
+    E|X(dt)|^q ~ dt^(tau(q) + 1). Every moment is fitted in one least squares call as get_Hc does for R/S.
+    :param dt: 1D array of time scales
+    :param S: (len(q) x len(dt)) array of S_q(dt) as returned by get_partition_function
+    :return: tau(q), c_q
+    """
+    A = np.vstack([np.log10(dt), np.ones(len(dt))]).T
+    tau, c = np.linalg.lstsq(A, np.log10(S).T, rcond=-1)[0]
+
+    return tau, c
+
+def get_multifractal_spectrum(q, tau):
+    """
+    Legendre transform of the scaling function.
+    :param q: 1D array of moments, ascending
+    :param tau: tau(q)
+    :return: alpha(q) = tau'(q), f(alpha) = q alpha - tau(q)
+    """
+    alpha = np.gradient(tau, q)
+
+    return alpha, q * alpha - tau
+
+def get_H_from_tau(q, tau):
+    """
+    :param q: 1D array of moments, ascending
+    :param tau: tau(q), increasing
+    :return: H such that tau(1/H) = 0
+    """
+    return 1 / np.interp(0, tau, q)
@@ -1,7 +1,7 @@
 import matplotlib.pyplot as plt; plt.style.use('ggplot')
 import numpy as np
 import math
-from fractalmarkets.rs.metrics import compute_ers
+from fractalmarkets.rs.null import get_ers
 
 def log_log_plot(x,y,H,c,show=True,V_stat=True):
 
@@ -34,8 +34,8 @@ def log_log_plot(x,y,H,c,show=True,V_stat=True):
                      xytext=(0,10),
                      ha='center')
 
-    ey = [ compute_ers(n) for n in x]
-    log_ey = [ math.log10(n) for n in ey ]
+    ey = get_ers(x)
+    log_ey = np.log10(ey)
 
     lm=[c + n*H for n in log_x] # assume empirical solution for eq 4.8
     r2=np.corrcoef(lm,log_y)[1][0]
@@ -0,0 +1,81 @@
+from fractalmarkets.rs.metrics import get_obv, to_log_returns_series, get_rs_data, get_Hc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import os
+
+def rolling_Hc(y, window, step=1, max_n=-1, n_workers=None, batch_size=None):
+    """
+    Hurst exponent over sliding windows. Window j covers y[j*step : j*step + window] and gives the same (H, c) as
+    RS(y[j*step : j*step + window]).get_Hc(max_n) up to rounding.
+
+    Log returns are taken once for the whole series. The AR(1) regression sums of each window are differences of prefix
+    sums of the log returns, and as every window has the same length the R/S window sizes are shared by all windows.
+    :param y: 1D array of prices
+    :param window: number of prices per window
+    :param step: number of prices the window slides by
+    :param max_n: largest R/S window size included in the fit, -1 for all
+    :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+    :param batch_size: number of windows per task
+    :return: (n_windows x 2) array of (H, c)
+    """
+    obv = min(get_obv(y[:window]), window)
+    starts = np.arange(0, len(y) - window + 1, step)
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    if batch_size is None:
+        batch_size = max(1, min(-(-len(starts) // n_workers), 2**22 // obv))
+
+    batches = []
+    for i in range(0, len(starts), batch_size):
+        s = starts[i:i + batch_size]
+        batches.append((y[s[0]:s[-1] + obv], s - s[0], obv, max_n))
+
+    if n_workers == 1:
+        Hc = [_rolling_Hc_batch(*batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            Hc = list(executor.map(_rolling_Hc_batch, *zip(*batches)))
+
+    return np.concatenate(Hc) if Hc else np.empty((0, 2))
+
+def get_rolling_ar1_residuals(x, starts, length):
+    """
+    AR(1) residuals of every window x[s:s + length] for s in starts, as get_ar1_residuals would compute them window by
+    window. The regression sums of each window are differences of prefix sums.
+    :param x: 1D array of numbers
+    :param starts: 1D array of window starts
+    :param length: number of points per window
+    :return: (len(starts) x length - 1) array of AR(1) residuals
+    """
+    c1  = np.concatenate([[0], np.cumsum(x)])
+    c2  = np.concatenate([[0], np.cumsum(np.power(x, 2))])
+    cxy = np.concatenate([[0], np.cumsum(np.multiply(x[1:], x[:-1]))])
+
+    end = starts + length
+    sum_xi  = c1[end - 1] - c1[starts]
+    sum_yi  = c1[end] - c1[starts + 1]
+    sum_xi2 = c2[end - 1] - c2[starts]
+    sum_xy  = cxy[end - 1] - cxy[starts]
+
+    sxx = length * sum_xi2 - np.power(sum_xi, 2)
+    sxy = length * sum_xy - sum_xi * sum_yi
+    slope = sxy / sxx
+    const = sum_yi / (length - 1) - slope * sum_xi / (length - 1)
+
+    windows = x[starts[:, np.newaxis] + np.arange(length)]
+
+    return windows[:, 1:] - (const[:, np.newaxis] + slope[:, np.newaxis] * windows[:, :-1])
+
+def _rolling_Hc_batch(y, starts, obv, max_n=-1):
+    """
+    :param y: 1D array of prices covering every window of the batch
+    :param starts: window starts relative to y
+    :param obv: number of prices per window passed on to R/S, see get_obv
+    :param max_n: largest R/S window size included in the fit, -1 for all
+    :return: (len(starts) x 2) array of (H, c)
+    """
+    logs = to_log_returns_series(y)
+    residuals = get_rolling_ar1_residuals(logs, starts, obv - 1)
+
+    H, c = get_Hc(get_rs_data(residuals), max_n=max_n)
+
+    return np.stack([H, c], axis=1)
@@ -1,53 +1,159 @@
-from fractalmarkets.rs.metrics import get_obv, to_log_returns_series, get_ar1_residuals, get_rs_data, get_Hc
+from fractalmarkets.rs.metrics import get_obv, to_log_returns_series, get_ar1_residuals, get_rs_data, get_Hc, get_vstat_cycles, get_window_sizes
 from fractalmarkets.rs.plots import log_log_plot
-import numpy as np 
+from fractalmarkets.instrumentation import NULL_STATS
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+import numpy as np
+import hashlib
+import threading
+import warnings
 
 class RS:
-    def __init__(self, y):
+    def __init__(self, y, cache_size=8, stats=None):
+        """
+        :param y: 1D array of prices
+        :param cache_size: number of analyzed series kept in the least recently used cache, 0 disables caching
+        :param stats: fractalmarkets.instrumentation.Stats recording stage times and cache hits
+        """
         # require type(y) == 'numpy.ndarray'
         if type(y).__module__ == 'numpy':
             self.y = y
         else:
             raise TypeError("{} is not a supported type for y. Supported type for y is 'numpy.ndarray'. Convert a list to ndarray with np.array(list).".format(type(y)))
 
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = NULL_STATS if stats is None else stats
+
     def get_Hc(self, max_n = -1):
-        return get_Hc(self.analyze(), max_n=max_n)
-    
-    def analyze(self):
-        obv = get_obv(self.y)
-        logs = to_log_returns_series(self.y[:obv])
-        residuals = get_ar1_residuals(logs)
+        data = self.analyze()
+        with self.stats.stage("fit"):
+            return get_Hc(data, max_n=max_n)
 
-        return get_rs_data(residuals)
+    def analyze(self, y=None):
+        """
+        :param y: 1D array of prices, defaults to self.y
+        :return: [N, RS] of the AR(1) residuals of the log returns, cached by the content of y
+        """
+        return list(self._get_analysis(self.y if y is None else y)[1])
 
-    def get_cycles(self, split_validations=2):
-        tmpy = self.y
-        yarr = np.split(self.y, split_validations)
+    def get_residuals(self, y=None):
+        """
+        :param y: 1D array of prices, defaults to self.y
+        :return: AR(1) residuals of the log returns passed on to R/S, cached by the content of y
+        """
+        return self._get_analysis(self.y if y is None else y)[0]
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _get_analysis(self, y):
+        """
+        Cached residuals and R/S table of y. The cache is keyed on the bytes of y so it stays valid if self.y is
+        replaced or modified in place, and is safe to share between threads. Cached arrays are read only.
+        :param y: 1D array of prices
+        :return: residuals, [N, RS]
+        """
+        key = (y.shape, y.dtype.str, hashlib.sha1(np.ascontiguousarray(y)).hexdigest())
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats.count("cache_hits")
+                return self._cache[key]
+
+        self.stats.count("cache_misses")
+        obv = get_obv(y)
+        with self.stats.stage("log_returns"):
+            logs = to_log_returns_series(y[:obv])
+        with self.stats.stage("ar1_residuals"):
+            residuals = get_ar1_residuals(logs)
+        with self.stats.stage("rs_data"):
+            rs_data = get_rs_data(residuals)
+        self.stats.allocate("residuals", residuals.nbytes)
 
+        for a in [residuals] + rs_data:
+            a.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = (residuals, rs_data)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return residuals, rs_data
+
+    def get_cycles(self, split_validations=2):
+        """
+        :param split_validations: number of chunks y is split into. Chunk lengths differ by at most one when the length
+        of y does not divide evenly
+        :return: union of the window sizes at which the V statistic of a chunk rises
+        """
         cycles = np.array([])
-        for y in yarr:
-            tmp_cycles = np.array([])
-            self.y = y
-            data = self.analyze()
-
-            vstaty = data[1]/np.sqrt(data[0])
-            vstatd = np.stack([data[0], vstaty], axis=1)
-            for a, b in zip(vstatd[:-1], vstatd[1:]):
-                if b[1] > a[1]:
-                    tmp_cycles = np.append(tmp_cycles, [round(b[0], 0)])
-            
-            cycles = np.union1d(cycles, tmp_cycles)
-        
-        self.y = tmpy
+        for y in np.array_split(self.y, split_validations):
+            cycles = np.union1d(cycles, get_vstat_cycles(self.analyze(y)))
 
         return cycles
 
+    def get_cycles_many(self, split_validations=range(2, 21), n_workers=1):
+        """
+        Cycle detection for many split configurations in one call. Log returns are taken once for the whole series and
+        sliced for every chunk, chunks of equal length within a configuration are analyzed as one 2D block and the
+        configurations can run on a process pool. Configurations that find no cycle, typically because their chunks are
+        too short for any R/S window, are left out of the common cycles with a warning.
+        :param split_validations: iterable of split counts, see get_cycles
+        :param n_workers: number of worker processes. None uses every cpu, 1 runs in the calling process
+        :return: {split count: cycles as returned by get_cycles}, cycles found by every configuration that found any
+        """
+        split_validations = list(split_validations)
+        logs = to_log_returns_series(self.y)
+
+        if n_workers == 1:
+            cycles = [_get_split_cycles(logs, k) for k in split_validations]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                cycles = list(executor.map(_get_split_cycles, [logs] * len(split_validations), split_validations))
+
+        empty = [k for k, c in zip(split_validations, cycles) if len(c) == 0]
+        if empty:
+            warnings.warn("Split counts {} found no cycles and are left out of the common cycles.".format(empty))
+
+        found = [c for c in cycles if len(c)]
+
+        return dict(zip(split_validations, cycles)), reduce(np.intersect1d, found, found[0] if found else np.array([]))
+
     def plot_vstat(self, max_n = -1):
         data = self.analyze()
-        H, c = self.get_Hc(max_n=max_n)
+        H, c = get_Hc(data, max_n=max_n)
 
         N = data[0] if max_n == -1 else data[0][np.where(data[0] <= max_n)]
         RS = data[1][:len(N)]
 
         log_log_plot(N, RS, H, c, V_stat=True)
-        
\ No newline at end of file
+
+def _get_split_cycles(logs, split_validations):
+    """
+    :param logs: log returns of the whole series
+    :param split_validations: number of chunks the prices are split into, as np.array_split would
+    :return: union of the window sizes at which the V statistic of a chunk rises
+    """
+    n_prices = len(logs) + 1
+    sizes = np.full(split_validations, n_prices // split_validations)
+    sizes[:n_prices % split_validations] += 1
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    blocks = {}
+    for start, size in zip(starts, sizes):
+        obv = min(get_obv(range(size)), size) # prices in the chunk passed on to R/S, as y[:obv] in _get_analysis
+        if len(get_window_sizes(obv - 2)): # chunks without any R/S window have no cycles
+            blocks.setdefault(obv, []).append(logs[start:start + obv - 1])
+
+    cycles = np.array([])
+    for block in blocks.values():
+        N, RS = get_rs_data(get_ar1_residuals(np.stack(block)))
+        for rs in RS:
+            cycles = np.union1d(cycles, get_vstat_cycles([N, rs]))
+
+    return cycles
+
@@ -0,0 +1,220 @@
+from fractalmarkets.rs.metrics import get_Hc
+import numpy as np
+import math
+
+class StreamingRS:
+    def __init__(self, window_sizes):
+        """
+        Online counterpart of fractalmarkets.rs.rs.RS for live prices. Prices are pushed one at a time and the R/S table
+        of the AR(1) residuals of their log returns can be read at any time.
+
+        The residual of pair (x_j, y_j) = (l_j, l_j+1) of log returns is y_j - const - slope * x_j where the regression
+        keeps changing as prices arrive. R/S is blind to const, and once a block of n pairs is complete its cumulative
+        deviation is A_t - slope * B_t with A, B the cumulative deviations of y and x. Each complete block keeps the upper
+        and lower convex hulls of the points (B_t, A_t), which hold the max and min of the cumulative deviation for any
+        slope, and the second moments of x and y, which give its standard deviation. Blocks are therefore exact for the
+        current slope without keeping raw history. The hulls of all blocks of a window size are stored end to end in flat
+        arrays, so a read is a few array passes over the hull vertices rather than a Python loop over blocks.
+
+        :param window_sizes: R/S window sizes n, blocks of n consecutive residuals as in get_rs_data
+        """
+        self.window_sizes = np.array(sorted(set(int(n) for n in window_sizes), reverse=True))
+        self.last_price = None
+        self.last_log = None
+        self.n_logs = 0
+
+        # AR(1) regression sums over pairs (x_j, y_j), see get_ar1_residuals
+        self.sum_x = 0.
+        self.sum_y = 0.
+        self.sum_x2 = 0.
+        self.sum_xy = 0.
+
+        self.buffers = {n: np.empty((2, n)) for n in self.window_sizes}
+        self.fill = {n: 0 for n in self.window_sizes}
+        self.blocks = {n: _BlockStore() for n in self.window_sizes}
+
+    def push(self, price):
+        """
+        Amortized O(number of window sizes) update, plus a sort of each block as it completes.
+        :param price: next price
+        """
+        if self.last_price is not None:
+            log = math.log(price / self.last_price)
+            if self.last_log is not None:
+                self._push_pair(self.last_log, log)
+            self.last_log = log
+            self.n_logs += 1
+
+        self.last_price = price
+
+    def extend(self, prices):
+        """
+        :param prices: iterable of prices, pushed in order
+        """
+        for price in prices:
+            self.push(price)
+
+    def get_slope(self):
+        """
+        :return: slope of the AR(1) regression of the log returns seen so far, as computed by get_ar1_residuals. nan
+        until the regression is defined
+        """
+        sxx = self.n_logs * self.sum_x2 - math.pow(self.sum_x, 2)
+        sxy = self.n_logs * self.sum_xy - self.sum_x * self.sum_y
+
+        if sxx == 0:
+            return math.nan
+
+        return sxy / sxx
+
+    def get_rs_data(self):
+        """
+        :return: [N, RS] over every complete block, largest window size first, like get_rs_data. Empty while the slope
+        is undefined or no block is complete
+        """
+        slope = self.get_slope()
+
+        N = []
+        RS = []
+        for n in self.window_sizes:
+            if self.blocks[n].size and not math.isnan(slope):
+                RS.append(np.mean(self.blocks[n].get_rs(slope, n)))
+                N.append(n)
+
+        return [np.array(N).astype(int), np.array(RS)]
+
+    def get_Hc(self, max_n=-1):
+        """
+        :param max_n: largest window size included in the fit, -1 for all
+        :return: Hurst exponent and constant as per get_Hc, (nan, nan) until two window sizes up to max_n have a
+        complete block
+        """
+        rs_data = self.get_rs_data()
+        N = rs_data[0] if max_n == -1 else rs_data[0][rs_data[0] <= max_n]
+        if len(N) < 2:
+            return math.nan, math.nan
+
+        return get_Hc(rs_data, max_n=max_n)
+
+    def _push_pair(self, x, y):
+        """
+        :param x: log return l_j
+        :param y: log return l_j+1
+        """
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_x2 += x * x
+        self.sum_xy += x * y
+
+        for n in self.window_sizes:
+            buffer = self.buffers[n]
+            buffer[0, self.fill[n]] = x
+            buffer[1, self.fill[n]] = y
+            self.fill[n] += 1
+
+            if self.fill[n] == n:
+                self.blocks[n].append(*self._summarize_block(buffer))
+                self.fill[n] = 0
+
+    def _summarize_block(self, buffer):
+        """
+        :param buffer: (2 x n) array of the pairs (x_j, y_j) of a complete block
+        :return: upper hull, lower hull of the points (B_t, A_t), and the centered second moments Sxx, Sxy, Syy
+        """
+        dx = buffer[0] - np.sum(buffer[0]) / buffer.shape[1]
+        dy = buffer[1] - np.sum(buffer[1]) / buffer.shape[1]
+        B = np.cumsum(dx)
+        A = np.cumsum(dy)
+
+        order = np.lexsort((A, B))
+        upper = self._get_upper_hull(B[order], A[order])
+        lower = self._get_upper_hull(B[order], -A[order])
+        lower[1] = -lower[1]
+
+        return upper, lower, np.sum(dx * dx), np.sum(dx * dy), np.sum(dy * dy)
+
+    def _get_upper_hull(self, x, y):
+        """
+        Monotone chain upper hull.
+        :param x: 1D array sorted ascending
+        :param y: 1D array, ties in x sorted ascending
+        :return: (2 x m) array of hull vertices
+        """
+        hull = []
+        for p in zip(x, y):
+            while len(hull) >= 2:
+                (ax, ay), (bx, by) = hull[-2], hull[-1]
+                if (bx - ax) * (p[1] - ay) - (by - ay) * (p[0] - ax) >= 0:
+                    hull.pop()
+                else:
+                    break
+            hull.append(p)
+
+        return np.array(hull).T
+
+class _BlockStore:
+    def __init__(self, capacity=16):
+        """
+        Summaries of the complete blocks of one window size. Hull vertices of every block are appended to flat arrays,
+        with the offset of each block, and grow by doubling.
+        :param capacity: initial number of blocks and of hull vertices held before growing
+        """
+        self.size = 0
+        self.upper = np.empty((2, capacity))
+        self.lower = np.empty((2, capacity))
+        self.n_upper = 0
+        self.n_lower = 0
+        self.upper_starts = np.empty(capacity, dtype=np.intp)
+        self.lower_starts = np.empty(capacity, dtype=np.intp)
+        self.moments = np.empty((3, capacity))
+
+    def append(self, upper, lower, sxx, sxy, syy):
+        """
+        :param upper: (2 x m) upper hull of the block
+        :param lower: (2 x m) lower hull of the block
+        :param sxx: centered second moment of x
+        :param sxy: centered cross moment of x and y
+        :param syy: centered second moment of y
+        """
+        self.upper_starts = _append(self.upper_starts, self.size, np.array([self.n_upper]))
+        self.lower_starts = _append(self.lower_starts, self.size, np.array([self.n_lower]))
+        self.moments = _append(self.moments, self.size, np.array([[sxx], [sxy], [syy]]))
+        self.upper = _append(self.upper, self.n_upper, upper)
+        self.lower = _append(self.lower, self.n_lower, lower)
+
+        self.size += 1
+        self.n_upper += upper.shape[1]
+        self.n_lower += lower.shape[1]
+
+    def get_rs(self, slope, n):
+        """
+        :param slope: AR(1) slope
+        :param n: window size
+        :return: array of the R/S of every block residuals at the given slope, see get_rs
+        """
+        upper = self.upper[:, :self.n_upper]
+        lower = self.lower[:, :self.n_lower]
+        sxx, sxy, syy = self.moments[:, :self.size]
+
+        R = np.maximum.reduceat(upper[1] - slope * upper[0], self.upper_starts[:self.size]) \
+            - np.minimum.reduceat(lower[1] - slope * lower[0], self.lower_starts[:self.size])
+        S = np.sqrt(np.maximum(syy - 2 * slope * sxy + slope * slope * sxx, 0) / n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where((R == 0) | (S == 0), 0, R / S)
+
+def _append(array, size, values):
+    """
+    :param array: storage growing along its last axis
+    :param size: number of entries in use along the last axis
+    :param values: entries to write after them
+    :return: array, or a copy twice as large when it is full, holding values at [..., size:size + len(values)]
+    """
+    end = size + values.shape[-1]
+    if end > array.shape[-1]:
+        grown = np.empty(array.shape[:-1] + (max(2 * array.shape[-1], end),), dtype=array.dtype)
+        grown[..., :size] = array[..., :size]
+        array = grown
+    array[..., size:end] = values
+
+    return array
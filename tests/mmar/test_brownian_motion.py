@@ -0,0 +1,65 @@
+from fractalmarkets.mmar.brownian_motion import BrownianMotion
+from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
+from fractalmarkets.instrumentation import Stats
+import numpy as np
+
+def test_vectorized_matches_recursive():
+    bm = BrownianMotion(5, .457, .603, randomize_segments=False)
+
+    assert np.array_equal(bm.simulate(method="vectorized"), bm.simulate(method="recursive"))
+
+def test_solve_vectorized_matches_fsolve():
+    bm = BrownianMotion(1, .457, .603)
+    dT = np.array([[0.2, 0.1, 0.3], [0.05, 0.6, 0.15], [0.01, 0.02, 0.03]])
+    w = np.array([0.4, 0.7, 0.1])
+
+    D, converged = bm.solve_vectorized(dT[:,0], dT[:,1], dT[:,2], w)
+
+    assert all(converged)
+    assert np.allclose(D, [bm.solve(*a, b)[0] for a, b in zip(dT, w)])
+
+def test_vectorized_matches_recursive_multifractal_time():
+    bmmt = BrownianMotionMultifractalTime(5, .457, .603, randomize_segments=False, randomize_time=False, M=[0.6, 0.4])
+
+    assert np.allclose(bmmt.simulate(method="vectorized"), bmmt.simulate(method="recursive"))
+    assert bmmt.unconverged_cells == 0
+
+def test_seeded_simulation_is_reproducible():
+    for method in ["vectorized", "recursive"]:
+        a = BrownianMotionMultifractalTime(4, .457, .603, randomize_segments=True, randomize_time=True, rng=3).simulate(method=method)
+        b = BrownianMotionMultifractalTime(4, .457, .603, randomize_segments=True, randomize_time=True).simulate(method=method, rng=3)
+
+        assert np.array_equal(a, b)
+
+def test_stats_record_stages_and_solver_counts():
+    calls = []
+    stats = Stats(callback=lambda kind, name, value: calls.append(kind))
+    bmmt = BrownianMotionMultifractalTime(5, x=0.457, y=0.603, randomize_segments=True, randomize_time=True, rng=0, stats=stats)
+    data = bmmt.simulate()
+
+    recorded = stats.as_dict()
+    assert recorded["calls"]["deform_clock_time"] == 5
+    assert recorded["counts"]["solved_cells"] == (3**5 - 1) // 2
+    assert recorded["counts"]["unconverged_cells"] == bmmt.unconverged_cells
+    assert recorded["bytes"]["path"] == data.nbytes
+    assert set(calls) == {"time", "count", "bytes"}
+
+def test_iter_simulate_matches_simulate(tmp_path):
+    bmmt = BrownianMotionMultifractalTime(6, x=0.457, y=0.603, randomize_time=True)
+    data = bmmt.simulate(rng=3)
+
+    blocks = list(bmmt.iter_simulate(block_size=100, rng=3))
+    assert [len(block) for block in blocks] == [100] * 7 + [30]
+    assert np.array_equal(np.concatenate(blocks), data)
+
+    out = bmmt.simulate_to_file(tmp_path / "path.npy", block_size=10, rng=3)
+    assert np.array_equal(np.load(tmp_path / "path.npy"), data)
+    assert np.array_equal(out, data)
+
+def test_cells_without_trading_time_stay_undeformed():
+    for bmmt in (BrownianMotionMultifractalTime(12, .457, .603, M=[0.9, 0.1]),
+                 BrownianMotionMultifractalTime(12, .457, .603, randomize_time=True, randomize_segments=True, M=[0.9, 0.1], rng=0)):
+        data = bmmt.simulate()
+
+        assert not np.any(np.isnan(data))
+        assert bmmt.unconverged_cells > 0
@@ -0,0 +1,13 @@
+from fractalmarkets.mmar.calibration import get_generator, calibrate
+import numpy as np
+
+def test_generator_of_brownian_motion():
+    assert np.allclose(get_generator(0.5), (4/9, 2/3))
+
+def test_calibrate_prunes_candidates():
+    y = np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 2000)))
+    result = calibrate(y, H=[0.5, 0.7], m_0=[0.5, 0.7], k_max=7, n_paths=2, rounds=2, n_workers=1)
+
+    assert result["candidates"].shape == (4, 4)
+    assert sorted(result["candidates"][:, 3]) == [2, 2, 6, 6]
+    assert result["score"] == np.min(result["candidates"][:, 2])
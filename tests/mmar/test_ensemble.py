@@ -0,0 +1,12 @@
+from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
+import numpy as np
+
+def test_simulate_many_reproducible_across_workers():
+    bmmt = BrownianMotionMultifractalTime(3, x=0.457, y=0.603, randomize_segments=True, randomize_time=True, M=[0.6, 0.4])
+
+    serial = bmmt.simulate_many(6, seed=42, n_workers=1)
+    parallel = bmmt.simulate_many(6, seed=42, n_workers=2, chunk_size=2)
+
+    assert serial.shape == (6, 3**3 + 1, 2)
+    assert np.array_equal(serial, parallel)
+    assert not np.array_equal(serial[0], serial[1])
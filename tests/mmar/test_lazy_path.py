@@ -0,0 +1,21 @@
+from fractalmarkets.mmar.brownian_motion import BrownianMotion
+from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
+from fractalmarkets.mmar.counter_rng import CounterRNG
+from fractalmarkets.mmar.lazy_path import LazyPath
+import numpy as np
+
+def test_value_at_matches_full_simulation():
+    for process in [BrownianMotion(6, 4/9, 2/3, randomize_segments=True), BrownianMotionMultifractalTime(6, 0.457, 0.603, randomize_time=True, randomize_segments=True)]:
+        data = process.simulate(rng=CounterRNG(5))
+        t = np.concatenate([[0, 1], data[10:20, 0], np.random.default_rng(0).random(200)])
+
+        assert np.allclose(LazyPath(process, seed=5).value_at(t), np.interp(t, data[:, 0], data[:, 1]), atol=1e-12)
+
+def test_segment_matches_full_simulation():
+    process = BrownianMotionMultifractalTime(6, 0.457, 0.603, randomize_time=True, randomize_segments=True)
+    data = process.simulate(rng=CounterRNG(2))
+    inside = (data[:, 0] >= 0.25) & (data[:, 0] <= 0.5)
+
+    segment = LazyPath(process, seed=2).segment(0.25, 0.5)
+    assert segment.shape == (np.count_nonzero(inside), 2)
+    assert np.allclose(segment, data[inside], atol=1e-12)
@@ -0,0 +1,23 @@
+from fractalmarkets.mmar.brownian_motion_multifractal_time import BrownianMotionMultifractalTime
+from fractalmarkets.mmar.resample import resample
+import pytest
+import numpy as np
+
+def test_resample_matches_interp():
+    paths = BrownianMotionMultifractalTime(5, 0.457, 0.603, randomize_time=True, randomize_segments=True).simulate_many(4, seed=0, n_workers=1)
+    grid, prices, increments = resample(paths, n_points=101)
+
+    assert prices.shape == (4, 101)
+    assert np.allclose(prices, [np.interp(grid, path[:, 0], path[:, 1]) for path in paths])
+    assert np.allclose(increments, np.diff(prices, axis=1))
+
+def test_resample_log_increments():
+    path = np.array([[0, 1.], [0.5, 2.], [1, 4.]])
+    grid, prices, increments = resample(path, n_points=5, increments="log")
+
+    assert np.allclose(prices, [1, 1.5, 2, 3, 4])
+    assert np.allclose(increments, np.diff(np.log(prices)))
+
+def test_log_increments_need_positive_prices():
+    with pytest.raises(ValueError):
+        resample(np.array([[0., 1.], [0.5, -0.5], [1., 2.]]), n_points=5, increments="log")
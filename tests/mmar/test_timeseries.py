@@ -6,3 +6,11 @@ def test_multiplicative_cascade():
 
     assert all(a == b for a, b in zip(c.data[:,0], [0, 0.5, 1]))
     assert all(a == b for a, b in zip(c.data[:,1], [0, 1.2, 0.8]))
+
+def test_vectorized_cascade_matches_recursive():
+    c = MutiplicativeCascade(4, [0.5, 0.3, 0.2], False)
+    c.cascade(method="recursive")
+    expected = c.data
+    c.cascade(method="vectorized")
+
+    assert all(a == b for a, b in zip(c.data[:,1], expected[:,1]))
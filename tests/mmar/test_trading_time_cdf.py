@@ -1,7 +1,36 @@
 from fractalmarkets.mmar.trading_time_cdf import TradingTimeCDF
+from fractalmarkets.mmar.cache import TableCache
+import numpy as np
 
 def test_diff_at_index_with_pct():
     tradingTime = TradingTimeCDF(1, [0.6, 0.4], randomize=False)
     tradingTime.create_trading_time_cdf()
 
-    assert round(tradingTime.cdf(.2) - tradingTime.cdf(0), 2) == 0.24
\ No newline at end of file
+    assert round(tradingTime.cdf(.2) - tradingTime.cdf(0), 2) == 0.24
+
+def test_inverse_cdf():
+    tradingTime = TradingTimeCDF(3, [0.6, 0.4], randomize=False)
+    tradingTime.create_trading_time_cdf()
+
+    t = np.linspace(0, 1, 50)
+
+    assert np.allclose(tradingTime.inverse(tradingTime.cdf(t)), t)
+
+def test_deterministic_tables_are_cached(tmp_path):
+    cache = TableCache(cache_dir=tmp_path)
+    first = TradingTimeCDF(6, [0.6, 0.4])
+    first.create_trading_time_cdf(cache=cache)
+    second = TradingTimeCDF(6, [0.6, 0.4])
+    second.create_trading_time_cdf(cache=cache)
+
+    assert second.table is first.table
+    assert second.cascade is None
+
+    loaded = TradingTimeCDF(6, [0.6, 0.4])
+    loaded.create_trading_time_cdf(cache=TableCache(cache_dir=tmp_path))
+    assert isinstance(loaded.table, np.memmap)
+    assert np.array_equal(loaded.table, first.table)
+
+    randomized = TradingTimeCDF(6, [0.6, 0.4], randomize=True, rng=0)
+    randomized.create_trading_time_cdf(cache=cache)
+    assert randomized.cascade is not None
@@ -0,0 +1,27 @@
+from fractalmarkets.msm.estimation import get_transition_matrix, hamilton_filter, _predict
+from fractalmarkets.msm.markov_switching_multifractal import MarkovSwitchingMultifractal
+import numpy as np
+
+def test_predict_matches_dense_transition_matrix():
+    transition_probabilities = np.array([0.05, 0.2, 0.6])
+    probabilities = np.array([0.1, 0.05, 0.2, 0.15, 0.1, 0.1, 0.25, 0.05])
+
+    assert np.allclose(_predict(probabilities, transition_probabilities), probabilities @ get_transition_matrix(transition_probabilities))
+
+def test_fit_recovers_m_0():
+    msm = MarkovSwitchingMultifractal(m_0=1.6, sigma_bar=0.01, b=3.0, gamma_1=0.1, k_bar=3, rng=11)
+    returns, _ = msm._simulate_returns_vectorized(msm.M[np.newaxis], msm.rng)
+
+    fit = MarkovSwitchingMultifractal(k_bar=3, rng=0).fit(returns[0])
+
+    assert abs(fit["m_0"] - 1.6) < 0.1
+    assert fit["log_likelihood"] >= hamilton_filter(returns[0], 1.6, 0.01, msm.transition_probabilities)[0]
+
+def test_filter_survives_outlier_returns():
+    transition_probabilities = MarkovSwitchingMultifractal(k_bar=3, rng=0).transition_probabilities
+    log_likelihood, filtered_volatility, filtered_probabilities = hamilton_filter(np.array([0.01, 10.0, 0.01, 0.02]), 1.4, 0.01, transition_probabilities)
+
+    assert np.isfinite(log_likelihood)
+    assert np.all(filtered_volatility > 0)
+    assert np.all(np.isfinite(filtered_probabilities))
+    assert filtered_volatility[1] > filtered_volatility[0]
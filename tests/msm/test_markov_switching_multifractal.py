@@ -0,0 +1,24 @@
+from fractalmarkets.msm.markov_switching_multifractal import MarkovSwitchingMultifractal
+import numpy as np
+
+def test_seeded_simulation_is_reproducible():
+    a = MarkovSwitchingMultifractal(k_bar=4, timesteps=200, rng=7).simulate()
+    b = MarkovSwitchingMultifractal(k_bar=4, timesteps=200, rng=7).simulate()
+
+    assert np.array_equal(a, b)
+
+def test_vectorized_simulation():
+    msm = MarkovSwitchingMultifractal(k_bar=4, timesteps=500, rng=1)
+    data = msm.simulate(method="vectorized")
+
+    assert data.shape == (500, 2)
+    assert np.isclose(np.ptp(data[:,1]), 1)
+    assert all(m in (msm.m_0, 2. - msm.m_0) for m in msm.M)
+
+def test_simulate_many():
+    msm = MarkovSwitchingMultifractal(k_bar=4, timesteps=300, rng=1)
+    paths = msm.simulate_many(5, chunk_size=2)
+
+    assert paths.shape == (5, 300, 2)
+    assert np.allclose(np.ptp(paths[:,:,1], axis=1), 1)
+    assert not np.array_equal(paths[0], paths[1])
@@ -1,4 +1,5 @@
-from fractalmarkets.rs.metrics import compute_ers
+from fractalmarkets.rs.metrics import compute_ers, get_rs, get_rs_data
+import numpy as np
 from math import log10
 
 def test_ers():
@@ -6,4 +7,11 @@ def test_ers():
     actual   = round(log10(compute_ers(650)), 3)
 
     # for lower values of n, i.e. compute_ers(x) where x < 650, the actual diverges slightly from expected
-    assert actual == expected
\ No newline at end of file
+    assert actual == expected
+
+def test_rs_data_matches_per_window_rs():
+    x = np.random.standard_normal(600)
+    N, RS = get_rs_data(x)
+
+    for n, rs in zip(N, RS):
+        assert rs == np.mean([get_rs(x[start:start + n]) for start in range(0, len(x), n)])
@@ -0,0 +1,13 @@
+from numpy import cumsum, exp, isclose
+from numpy.random import randn
+from fractalmarkets.rs.multi import MultiRS
+from fractalmarkets.rs.rs import RS
+
+def test_multi_matches_rs_per_series():
+    s = exp(cumsum(randn(3, 1200) * 0.01, axis=1))
+
+    Hc = MultiRS(s).get_Hc()
+    ragged = MultiRS({"a": s[0], "b": s[1, :700]}).get_Hc()
+
+    assert all(isclose(Hc[i][0], RS(s[i]).get_Hc()[0]) for i in range(3))
+    assert isclose(ragged["b"][0], RS(s[1, :700]).get_Hc()[0])
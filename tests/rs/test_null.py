@@ -0,0 +1,26 @@
+from fractalmarkets.rs.metrics import compute_ers
+from fractalmarkets.rs.null import get_ers, get_ers_table, simulate_null_rs
+import numpy as np
+
+def test_ers_table_matches_compute_ers(tmp_path):
+    table = get_ers_table(700, cache_dir=tmp_path)
+
+    assert all(np.isclose(table[n], compute_ers(n)) for n in [10, 100, 650])
+
+def test_null_rs_is_cached(tmp_path):
+    N, RS = simulate_null_rs(500, n_sims=20, seed=3, n_workers=1, cache_dir=tmp_path)
+    _, cached = simulate_null_rs(500, n_sims=20, seed=3, n_workers=1, chunk_size=7, cache_dir=tmp_path)
+    _, recomputed = simulate_null_rs(500, n_sims=20, seed=3, n_workers=1, chunk_size=7, cache_dir=tmp_path / "other")
+
+    assert RS.shape == (20, len(N))
+    assert np.array_equal(RS, cached)
+    assert np.array_equal(RS, recomputed)
+
+def test_ers_table_without_writable_cache(tmp_path, monkeypatch):
+    unwritable = tmp_path / "file"
+    unwritable.write_text("")
+    monkeypatch.setenv("FRACTALMARKETS_CACHE_DIR", str(unwritable))
+    monkeypatch.setattr("fractalmarkets.rs.null._ers_table", np.array([np.nan]))
+
+    assert np.allclose(get_ers([10, 100]), [compute_ers(10), compute_ers(100)])
+    assert simulate_null_rs(500, n_sims=2, seed=0, n_workers=1)[1].shape[0] == 2
@@ -0,0 +1,20 @@
+from fractalmarkets.rs.partition import get_partition_function, get_tau, get_H_from_tau
+import numpy as np
+
+def test_partition_function_matches_direct_sum():
+    y = np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.01, 1000)))
+    q = np.array([-1., 0.5, 2.])
+    dt, S = get_partition_function(y, q, dt=[1, 7], chunk_size=50)
+
+    X = np.log(y) - np.log(y[0])
+    for j, d in enumerate(dt):
+        increments = np.abs(np.diff(X[::d]))
+        assert np.allclose(S[:, j], [np.sum(increments ** k) for k in q])
+
+def test_tau_of_random_walk():
+    y = np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, 200000)))
+    q = np.linspace(0.5, 3, 6)
+    tau, _ = get_tau(*get_partition_function(y, q))
+
+    assert np.allclose(tau, q / 2 - 1, atol=0.05)
+    assert abs(get_H_from_tau(q, tau) - 0.5) < 0.02
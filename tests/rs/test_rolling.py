@@ -0,0 +1,13 @@
+from numpy import allclose, array, cumsum, log
+from numpy.random import randn
+from fractalmarkets.rs.rolling import rolling_Hc
+from fractalmarkets.rs.rs import RS
+
+def test_rolling_matches_rs_per_window():
+    s = log(cumsum(randn(3000))+1000)
+
+    Hc = rolling_Hc(s, 1000, step=250, n_workers=1)
+    expected = array([RS(s[start:start + 1000]).get_Hc() for start in range(0, 2001, 250)])
+
+    assert Hc.shape == (9, 2)
+    assert allclose(Hc, expected)
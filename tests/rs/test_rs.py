@@ -1,6 +1,7 @@
 from numpy import cumsum, log, polyfit, sqrt, std, subtract
 from numpy.random import randn
 from fractalmarkets.rs.rs import RS
+import pytest
 
 def test_mean_reverting():
     s = log(cumsum(randn(100000))+1000)
@@ -8,4 +9,34 @@ def test_mean_reverting():
     rs = RS(s)
     H, c = rs.get_Hc()
 
-    assert 0.45 < round(H, 2) < 0.55
\ No newline at end of file
+    assert 0.45 < round(H, 2) < 0.55
+
+def test_analysis_is_cached():
+    s = log(cumsum(randn(2000))+1000)
+
+    rs = RS(s, cache_size=2)
+    cycles = rs.get_cycles(2)
+
+    assert rs.y is s
+    assert rs.analyze()[1] is rs.analyze()[1]
+    assert (cycles == rs.get_cycles(2)).all()
+    assert len(rs._cache) == 2
+
+
+def test_cycles_many_matches_get_cycles():
+    s = log(cumsum(randn(3001))+1000)
+
+    rs = RS(s)
+    cycles, common = rs.get_cycles_many([2, 3, 5])
+
+    assert all((cycles[k] == rs.get_cycles(k)).all() for k in [2, 3, 5])
+    assert set(common) <= set(cycles[2])
+
+def test_cycles_many_skips_configurations_without_cycles():
+    s = log(cumsum(randn(1001))+1000)
+
+    with pytest.warns(UserWarning, match="found no cycles"):
+        cycles, common = RS(s).get_cycles_many([2, 20])
+
+    assert len(cycles[20]) == 0
+    assert (common == cycles[2]).all()
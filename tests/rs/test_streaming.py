@@ -0,0 +1,26 @@
+from numpy import allclose, cumsum, isnan, log
+from numpy.random import randn
+from fractalmarkets.rs.metrics import get_window_sizes
+from fractalmarkets.rs.streaming import StreamingRS
+from fractalmarkets.rs.rs import RS
+
+def test_streaming_matches_rs():
+    s = log(cumsum(randn(1002))+1000)
+
+    rs = StreamingRS(get_window_sizes(1000))
+    rs.extend(s)
+
+    assert allclose(rs.get_rs_data()[1], RS(s).analyze()[1])
+    assert allclose(rs.get_Hc(), RS(s).get_Hc())
+
+def test_reads_before_first_block():
+    rs = StreamingRS([10, 20])
+    assert isnan(rs.get_slope())
+
+    rs.extend(log(cumsum(randn(10))+1000))
+    assert len(rs.get_rs_data()[0]) == 0
+    assert all(isnan(rs.get_Hc()))
+
+    rs.extend(log(cumsum(randn(5))+1000))
+    assert list(rs.get_rs_data()[0]) == [10]
+    assert all(isnan(rs.get_Hc()))
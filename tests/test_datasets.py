@@ -0,0 +1,31 @@
+from fractalmarkets.datasets import load_prices
+import numpy as np
+import os
+
+def test_load_prices_caches_columns(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text("Date,Close\n2020-01-02,10.5\n2020-01-03,11\n\n2020-01-06,10.75\n")
+
+    dates, prices = load_prices(path, cache_dir=tmp_path / "cache", chunk_size=2)
+    assert isinstance(prices, np.memmap)
+    assert np.array_equal(prices, [10.5, 11, 10.75])
+    assert np.array_equal(dates, np.array(["2020-01-02", "2020-01-03", "2020-01-06"], dtype="datetime64[s]"))
+
+    path.write_text("Date,Close\n2020-01-02,10.5\n2020-01-03,12\n")
+    os.utime(path, ns=(0, 0))
+    dates, prices = load_prices(path, cache_dir=tmp_path / "cache")
+    assert np.array_equal(prices, [10.5, 12])
+
+def test_load_single_column(tmp_path):
+    dates, prices = load_prices("datasets/sp500.csv", cache_dir=tmp_path, validate="hash")
+
+    assert dates is None
+    assert np.array_equal(prices, np.loadtxt("datasets/sp500.csv"))
+
+def test_blank_lines_spanning_a_chunk(tmp_path):
+    path = tmp_path / "prices.csv"
+    path.write_text("1.0\n2.0\n\n\n3.0\n4.0\n")
+
+    _, prices = load_prices(path, cache_dir=tmp_path / "cache", chunk_size=2)
+
+    assert np.array_equal(prices, [1., 2., 3., 4.])